@@ -0,0 +1,60 @@
+# database/sql/benchmarks/bench_async.py
+"""
+Concurrencia de execute_query_async frente a llamar execute_query (bloqueante)
+desde el event loop, contra una BD local que duerme para simular latencia.
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.bench_async --users 32 --requests 10 --query-ms 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from database.sql.navision_connector import configure_pool
+from database.sql.executor import ASYNC_WORKERS, execute_query, execute_query_async
+from database.sql.benchmarks.standin import build_standin_db, isolate_snapshots, sleepy_factory, percentile
+
+def _intent(user: int, i: int, n_obras: int):
+    return {"query_key": "contactos_obra_por_codigo", "obra_code": str((user * 31 + i) % n_obras + 1)}
+
+async def user_session(user: int, n_requests: int, n_obras: int, use_async: bool, samples: list):
+    for i in range(n_requests):
+        t0 = time.perf_counter()
+        if use_async:
+            await execute_query_async(_intent(user, i, n_obras), use_cache=False)
+        else:
+            execute_query(_intent(user, i, n_obras), use_cache=False)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+
+async def run(n_users: int, n_requests: int, n_obras: int, use_async: bool):
+    samples: list = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user_session(u, n_requests, n_obras, use_async, samples) for u in range(n_users)))
+    return time.perf_counter() - t0, samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la API async del executor")
+    parser.add_argument("--users", type=int, default=32, help="Usuarios concurrentes")
+    parser.add_argument("--requests", type=int, default=10, help="Peticiones por usuario")
+    parser.add_argument("--obras", type=int, default=1000)
+    parser.add_argument("--query-ms", type=float, default=50.0, help="Latencia simulada por sentencia")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "navision_standin.db")
+    build_standin_db(path, n_obras=args.obras)
+    isolate_snapshots()
+    configure_pool(sleepy_factory(path, args.query_ms), min_size=1, max_size=ASYNC_WORKERS)
+
+    total = args.users * args.requests
+    print(f"{args.users} usuarios x {args.requests} peticiones, {args.query_ms:.0f} ms/sentencia, "
+          f"{ASYNC_WORKERS} hilos")
+    print(f"{'modo':<10}{'total s':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, use_async in (("bloqueante", False), ("async", True)):
+        elapsed, samples = asyncio.run(run(args.users, args.requests, args.obras, use_async))
+        print(f"{label:<10}{elapsed:>10.2f}{total / elapsed:>10.1f}"
+              f"{percentile(samples, 50):>10.1f}{percentile(samples, 99):>10.1f}")
+
+if __name__ == "__main__":
+    main()
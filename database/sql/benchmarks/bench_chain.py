@@ -0,0 +1,105 @@
+# database/sql/benchmarks/bench_chain.py
+"""
+Latencia de run_nl_to_sql por etapas (LLM, SQL y el resto: router, selección
+de tools, parseo) y de punta a punta, reproduciendo un cassette
+(graph/chains/replay.py) con latencias inyectadas: sin Vertex ni Navision.
+
+Con --synthetic el cassette se genera al vuelo contra la BD sintética
+(standin.py), así que el benchmark funciona sin ninguna grabación previa.
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.bench_chain --synthetic --llm-ms 800 --sql-ms 40
+    python -m database.sql.benchmarks.bench_chain --cassette data/replay/cassette.json --no-router
+    python -m database.sql.benchmarks.bench_chain --synthetic --no-router --speculative
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+STAGES = ["llm", "sql", "resto", "total"]
+
+def _row(label: str, samples: List[float], percentile) -> str:
+    mean = sum(samples) / len(samples) if samples else 0.0
+    return (f"{label:<8}{mean:>10.1f}{percentile(samples, 50):>10.1f}"
+            f"{percentile(samples, 95):>10.1f}{percentile(samples, 99):>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapas de run_nl_to_sql (replay)")
+    parser.add_argument("--cassette", help="Cassette grabado con 'python -m graph.chains.replay record'")
+    parser.add_argument("--synthetic", action="store_true", help="Genera el cassette contra la BD sintética")
+    parser.add_argument("--corpus", help="Fichero con una pregunta por línea (por defecto, los ejemplos del REGISTRY)")
+    parser.add_argument("--iterations", type=int, default=5, help="Pasadas por el corpus")
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="Latencia inyectada por llamada al LLM")
+    parser.add_argument("--sql-ms", type=float, default=40.0, help="Latencia inyectada por query")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Ruido uniforme ±fracción sobre las latencias")
+    parser.add_argument("--no-router", action="store_true", help="Desactiva el pre-router (todo va al LLM)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Ejecuta la query probable mientras responde el LLM (speculation.py)")
+    args = parser.parse_args()
+
+    # Antes de importar la cadena: las cachés y el router se leen al importar
+    if args.no_router:
+        os.environ["INTENT_ROUTER_ENABLED"] = "0"
+    from graph.chains.replay import (
+        DEFAULT_CASSETTE, Cassette, Latency, disable_caches, install, load_corpus, synthetic_cassette, uninstall,
+    )
+    disable_caches()
+    from database.sql.benchmarks.standin import build_standin_db, isolate_snapshots, percentile, sqlite_factory
+    from database.sql.navision_connector import configure_pool
+    from graph.chains import sql_retrieval_chain as chain
+    from graph.chains.speculation import SPECULATION_STATS
+
+    questions = load_corpus(args.corpus)
+    if args.synthetic:
+        path = os.path.join(tempfile.mkdtemp(), "navision_standin.db")
+        build_standin_db(path, n_obras=1000)
+        isolate_snapshots()
+        configure_pool(sqlite_factory(path))
+        cassette = synthetic_cassette(questions)
+    else:
+        cassette = Cassette.load(args.cassette or DEFAULT_CASSETTE)
+
+    model, executor = install(cassette, Latency(args.llm_ms, args.jitter), Latency(args.sql_ms, args.jitter, seed=7))
+    samples: Dict[str, List[float]] = {s: [] for s in STAGES}
+    errors = 0
+    try:
+        # Una pasada sin medir: imports perezosos y tools enlazadas por selección
+        for q in questions:
+            try:
+                chain.run_nl_to_sql(q, speculative=args.speculative)
+            except Exception:
+                pass
+        llm_calls0 = model.timer.snapshot()[1]
+        for _ in range(args.iterations):
+            for q in questions:
+                llm0, sql0 = model.timer.snapshot()[0], executor.timer.snapshot()[0]
+                t0 = time.perf_counter()
+                try:
+                    chain.run_nl_to_sql(q, speculative=args.speculative)
+                except Exception:
+                    errors += 1
+                total = (time.perf_counter() - t0) * 1000
+                llm = model.timer.snapshot()[0] - llm0
+                sql = executor.timer.snapshot()[0] - sql0
+                for stage, ms in zip(STAGES, (llm, sql, max(0.0, total - llm - sql), total)):
+                    samples[stage].append(ms)
+    finally:
+        uninstall()
+
+    llm_calls = model.timer.snapshot()[1] - llm_calls0
+    print(f"{len(questions)} preguntas x {args.iterations} pasadas; LLM {args.llm_ms:.0f} ms, "
+          f"SQL {args.sql_ms:.0f} ms (±{args.jitter:.0%}); router {'off' if args.no_router else 'on'}")
+    print(f"{'etapa':<8}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage in STAGES:
+        print(_row(stage, samples[stage], percentile))
+    print(f"Llamadas al LLM: {llm_calls}/{len(samples['total'])}; preguntas con error: {errors}")
+    if args.speculative:
+        spec = SPECULATION_STATS.stats()
+        print(f"Especulación: {spec['started']} lanzadas, aciertos {spec['hit_rate']:.0%}, "
+              f"{spec['failed']} fallidas, {spec['cancelled']} canceladas, "
+              f"{spec['avg_saved_ms']:.1f} ms ahorrados por acierto")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# database/sql/benchmarks/bench_import.py
+"""
+Tiempo de importación de la cadena NL->SQL con "python -X importtime", en
+procesos nuevos (sin módulos ya cargados). Informa de la mediana acumulada,
+los imports directos más pesados y si se han cargado los SDK pesados, que
+solo deberían cargarse al llamar al LLM (get_llm / warmup).
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.bench_import --runs 5
+    python -m database.sql.benchmarks.bench_import --module main --warmup
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ["langchain_google_vertexai", "vertexai", "langchain_core", "pydantic", "numpy", "pandas"]
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Líneas de -X importtime como (módulo, self_us, acumulado_us, profundidad)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cum_us), depth))
+    return rows
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    totals, children = [], {}
+    for _ in range(runs):
+        rows = parse_importtime(_run(f"import {module}", importtime=True).stderr)
+        target = next(r for r in rows if r[0] == module)
+        totals.append(target[2] / 1000.0)
+        # Hijos directos del módulo: los que aparecen justo antes con profundidad +1
+        idx = rows.index(target)
+        for name, _, cum, depth in reversed(rows[:idx]):
+            if depth <= target[3]:
+                break
+            if depth == target[3] + 1:
+                children.setdefault(name, []).append(cum / 1000.0)
+    loaded = json.loads(_run(
+        f"import sys, json; import {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    ).stdout)
+    top = sorted(((statistics.median(v), k) for k, v in children.items()), reverse=True)[:10]
+    return {"median_ms": statistics.median(totals), "runs_ms": totals, "top": top, "heavy_loaded": loaded}
+
+def measure_warmup(module: str) -> float:
+    out = _run(f"import {module} as m; print(m.warmup())").stdout.strip().splitlines()[-1]
+    return float(out) * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de importación")
+    parser.add_argument("--module", default="graph.chains.sql_retrieval_chain", help="Módulo a importar")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos nuevos a medir")
+    parser.add_argument("--warmup", action="store_true",
+                        help="Mide también warmup() (carga del SDK y construcción del modelo)")
+    args = parser.parse_args()
+
+    stats = measure(args.module, args.runs)
+    print(f"📦 import {args.module}: mediana {stats['median_ms']:.1f} ms "
+          f"({', '.join(f'{t:.0f}' for t in stats['runs_ms'])} ms)")
+    print("   Imports directos más pesados:")
+    for ms, name in stats["top"]:
+        print(f"   {ms:8.1f} ms  {name}")
+    if stats["heavy_loaded"]:
+        print(f"⚠️ Módulos pesados cargados al importar: {', '.join(stats['heavy_loaded'])}")
+    else:
+        print("✅ Ningún SDK pesado se carga al importar")
+    if args.warmup:
+        module = "graph.chains.sql_retrieval_chain"
+        print(f"🔥 warmup() de {module}: {measure_warmup(module):.1f} ms")
+
+if __name__ == "__main__":
+    main()
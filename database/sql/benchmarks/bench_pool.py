@@ -0,0 +1,55 @@
+# database/sql/benchmarks/bench_pool.py
+"""
+Compara execute_query abriendo una conexión por petición frente al pool.
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.bench_pool --requests 500 --handshake-ms 25
+    python -m database.sql.benchmarks.bench_pool --odbc "DRIVER={SQLite3};Database=/tmp/nav.db"
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from database.sql.navision_connector import configure_pool
+from database.sql.executor import execute_query
+from database.sql.benchmarks.standin import build_standin_db, isolate_snapshots, sqlite_factory, odbc_factory, percentile
+
+def run(n_requests: int, pooled: bool, n_obras: int):
+    samples = []
+    for i in range(n_requests):
+        intent = {"query_key": "contactos_obra_por_codigo", "obra_code": str(i % n_obras + 1)}
+        t0 = time.perf_counter()
+        execute_query(intent, pooled=pooled, use_cache=False)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de conexiones Navision")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--obras", type=int, default=1000)
+    parser.add_argument("--handshake-ms", type=float, default=25.0,
+                        help="Latencia simulada al abrir conexión (solo SQLite)")
+    parser.add_argument("--odbc", type=str, default=None,
+                        help="Cadena de conexión ODBC local en lugar de sqlite3")
+    args = parser.parse_args()
+
+    if args.odbc:
+        factory = odbc_factory(args.odbc)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "navision_standin.db")
+        build_standin_db(path, n_obras=args.obras)
+        factory = sqlite_factory(path, handshake_ms=args.handshake_ms)
+
+    isolate_snapshots()
+    pool = configure_pool(factory, min_size=1, max_size=4)
+
+    print(f"{'modo':<10}{'p50 ms':>10}{'p99 ms':>10}{'media ms':>10}")
+    for label, pooled in (("directo", False), ("pool", True)):
+        samples = run(args.requests, pooled, args.obras)
+        print(f"{label:<10}{percentile(samples, 50):>10.2f}{percentile(samples, 99):>10.2f}"
+              f"{sum(samples) / len(samples):>10.2f}")
+    print(f"Pool: {pool.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# database/sql/benchmarks/bench_suite.py
+"""
+Suite de benchmarks del camino SQL contra la BD sintética (standin.py):
+ejecuta las queries del REGISTRY (vía execute_query, sin caché) y las de los
+python_examples, y muestra throughput y percentiles de latencia por query.
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.bench_suite --rows 100000 --iterations 200
+    python -m database.sql.benchmarks.bench_suite --db /tmp/navision_standin.db --json resultados.json
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database.sql.navision_connector import borrow_connection, configure_pool
+from database.sql.executor import execute_query
+from database.sql.registry import REGISTRY
+from database.sql.benchmarks.standin import build_standin_db, isolate_snapshots, sqlite_factory, percentile, to_sqlite
+
+EXAMPLES_DIR = Path(__file__).resolve().parents[1] / "python_examples"
+
+# Sentencia de cada script de python_examples: (fichero, función que la define
+# en su variable "query", o None si es la constante QUERY del módulo)
+EXAMPLE_SOURCES: Dict[str, Tuple[str, Optional[str]]] = {
+    "kpir": ("query_kpir_navision.py", "get_desviacion_kpir"),
+    "precio": ("query_precio_navision.py", "get_precio_obra"),
+    "plazo": ("query_plazo_navision.py", "get_fechas_plazo"),
+    "cert_obra": ("query_cert_obra_navision.py", "get_certificacion_parcial"),
+    "detalle_obra": ("query_detalle_obra.py", None),
+    "venta_firme": ("query_margenes_navision.py", "get_venta_firme"),
+    "coste_total": ("query_margenes_navision.py", "get_coste_total"),
+    "s_curve": ("query_s_curve_navision.py", "get_produccion_diaria"),
+}
+
+def load_example_sql(filename: str, function: Optional[str]) -> str:
+    """
+    Lee el T-SQL tal cual está en el script, sin importarlo (al importarse
+    cargan el .env y pyodbc), para que el benchmark no se desvíe de él.
+    """
+    tree = ast.parse((EXAMPLES_DIR / filename).read_text(encoding="utf-8"))
+    scope: Any = tree
+    if function is not None:
+        scope = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == function)
+    target = "QUERY" if function is None else "query"
+    for node in scope.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == target):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"No se encontró '{target}' en {filename}" + (f" ({function})" if function else ""))
+
+def _example_runner(sql: str) -> Callable[[str], None]:
+    sql = to_sqlite(sql)
+
+    def run(obra_code: str) -> None:
+        with borrow_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, (obra_code,))
+                cur.fetchall()
+            finally:
+                cur.close()
+    return run
+
+def _registry_runner(query_key: str) -> Callable[[str], None]:
+    return lambda obra_code: execute_query(
+        {"query_key": query_key, "obra_code": obra_code}, use_cache=False
+    )
+
+def bench(run: Callable[[str], None], obra_codes: List[str], concurrency: int) -> Dict[str, float]:
+    def timed(code: str) -> float:
+        t0 = time.perf_counter()
+        run(code)
+        return (time.perf_counter() - t0) * 1000.0
+
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, obra_codes))
+    else:
+        samples = [timed(c) for c in obra_codes]
+    elapsed = time.perf_counter() - t0
+    return {
+        "n": len(samples),
+        "qps": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del executor contra la BD sintética")
+    parser.add_argument("--rows", type=int, default=100_000, help="Filas de movproyecto si se genera la BD")
+    parser.add_argument("--db", type=str, default=None, help="BD sintética ya generada (standin.py)")
+    parser.add_argument("--iterations", type=int, default=200, help="Ejecuciones por query")
+    parser.add_argument("--concurrency", type=int, default=1, help="Hilos concurrentes")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", type=str, default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "navision_standin.db")
+        build_standin_db(path, rows=args.rows)
+    isolate_snapshots()
+    configure_pool(sqlite_factory(path), min_size=1, max_size=max(1, args.concurrency))
+
+    with borrow_connection() as conn:
+        n_obras = conn.cursor().execute("SELECT COUNT(*) FROM [obras ayu]").fetchone()[0]
+    rnd = random.Random(args.seed)
+    obra_codes = [str(rnd.randint(1, n_obras)) for _ in range(args.iterations)]
+
+    runners = {f"registry:{qk}": _registry_runner(qk) for qk in REGISTRY}
+    runners.update({
+        f"example:{name}": _example_runner(load_example_sql(*source)) for name, source in EXAMPLE_SOURCES.items()
+    })
+
+    results = {}
+    print(f"{'query':<42}{'q/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, run in runners.items():
+        r = results[name] = bench(run, obra_codes, args.concurrency)
+        print(f"{name:<42}{r['qps']:>10.1f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"db": path, "iterations": args.iterations,
+                       "concurrency": args.concurrency, "results": results}, f, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+if __name__ == "__main__":
+    main()
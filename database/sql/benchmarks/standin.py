@@ -0,0 +1,254 @@
+# database/sql/benchmarks/standin.py
+"""
+BD local (SQLite) con datos sintéticos que imita las tablas de Navision que
+consultan el REGISTRY y los python_examples, para poder medir el camino SQL
+sin el servidor de producción.
+
+Uso (desde la raíz del proyecto):
+    python -m database.sql.benchmarks.standin --rows 1000000 --out /tmp/navision_standin.db
+"""
+import argparse
+import datetime as dt
+import itertools
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Iterator, List, Optional
+
+from database.sql.pagination import sqlite_sql
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS [obras ayu] (
+        No_ TEXT PRIMARY KEY,
+        [Nº proyecto] TEXT,
+        Description TEXT,
+        [Job Posting Group] TEXT,
+        Estado TEXT,
+        [Presupuesto Vigente+IVA] REAL,
+        [Coste Real] REAL,
+        [Plazo inicial_AYU] INTEGER,
+        [Fecha acta recep_ definitiva] TEXT,
+        [Fecha adjudicación] TEXT,
+        [Fecha firma contrato] TEXT,
+        [Fecha acta de replanteo] TEXT,
+        [Fecha Fin Vigente] TEXT,
+        [Creation Date] TEXT,
+        [Last Date Modified] TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS [usuarios obras] (
+        [Nº proyecto] TEXT,
+        Usuario TEXT,
+        Cargo INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS usuariosnav (
+        userid TEXT PRIMARY KEY,
+        nombre TEXT,
+        movil TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS movproyecto (
+        [Entry No_] INTEGER PRIMARY KEY,
+        [Job No_] TEXT,
+        empresa INTEGER,
+        [Posting Date] TEXT,
+        [Document No_] TEXT,
+        [Vendor No_] TEXT,
+        Actividad TEXT,
+        [Total Price (LCY)] REAL,
+        [Total Cost Prev] REAL,
+        [Total Cost (LCY)] REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS [detalles produccion] (
+        [Nº Proyecto] TEXT,
+        Tipo INTEGER,
+        Fecha TEXT,
+        Importe REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS VERSA (
+        obra TEXT PRIMARY KEY,
+        [K DE PIR] REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS COSTETOTALOBRAS (
+        obra TEXT PRIMARY KEY,
+        COSTETOTAL REAL
+    )""",
+    # Índices equivalentes a las claves por las que filtra Navision
+    "CREATE INDEX IF NOT EXISTS ix_usuarios_obras ON [usuarios obras]([Nº proyecto])",
+    "CREATE INDEX IF NOT EXISTS ix_movproyecto_job ON movproyecto([Job No_], empresa)",
+    "CREATE INDEX IF NOT EXISTS ix_detalles_proyecto ON [detalles produccion]([Nº Proyecto], Tipo)",
+]
+
+TABLES = ["[obras ayu]", "[usuarios obras]", "usuariosnav", "movproyecto",
+          "[detalles produccion]", "VERSA", "COSTETOTALOBRAS"]
+
+GROUPS = ["1:EDIF RES", "2:EDIF NOR", "3:REHAB", "4:O CIVIL"]
+ACTIVIDADES = ["ESTRUCTURA", "CIMENTACION", "INSTALACIONES", "ACABADOS", "URBANIZACION"]
+INSERT_BATCH = 10_000
+
+def _day(rnd: random.Random, start: dt.date, span_days: int) -> str:
+    return (start + dt.timedelta(days=rnd.randrange(span_days))).isoformat()
+
+def _insert(conn, sql: str, rows: Iterator[tuple]) -> None:
+    # Inserta por bloques para generar millones de filas sin tenerlas en memoria
+    while True:
+        chunk = list(itertools.islice(rows, INSERT_BATCH))
+        if not chunk:
+            return
+        conn.executemany(sql, chunk)
+
+def build_standin_db(path: str, rows: int = 10_000, n_obras: Optional[int] = None, seed: int = 42) -> str:
+    """
+    Crea la BD local con datos sintéticos. rows es el tamaño de movproyecto
+    (la tabla grande, de 1k a 1M); el resto escala a partir de ella:
+    n_obras = rows / 100 (mín. 50), 4 contactos por obra, rows / 4 detalles de producción.
+    Las obras se numeran "1".."n_obras".
+    """
+    rnd = random.Random(seed)
+    n_obras = n_obras or max(50, rows // 100)
+    n_users = max(10, n_obras // 2)
+    base = dt.date(2018, 1, 1)
+    conn = sqlite3.connect(path)
+    try:
+        # Siempre se regenera desde cero para que los datos sean reproducibles
+        for table in TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        _insert(conn, "INSERT OR REPLACE INTO usuariosnav VALUES (?, ?, ?)", (
+            (f"U{u}", f"Usuario {u}", f"6{rnd.randint(10**7, 10**8 - 1)}") for u in range(n_users)
+        ))
+
+        def obras():
+            for o in range(1, n_obras + 1):
+                presupuesto = round(rnd.uniform(2e5, 2e7), 2)
+                yield (
+                    str(o), str(o), f"Obra {o}", rnd.choice(GROUPS), rnd.choice(["ABIERTA", "CERRADA"]),
+                    presupuesto, round(presupuesto * rnd.uniform(0.7, 1.1), 2), rnd.randint(6, 48) * 30,
+                    _day(rnd, base, 3000), _day(rnd, base, 3000), _day(rnd, base, 3000),
+                    _day(rnd, base, 3000), _day(rnd, base, 3000), _day(rnd, base, 3000), _day(rnd, base, 3000),
+                )
+        _insert(conn, f"INSERT OR REPLACE INTO [obras ayu] VALUES ({', '.join('?' * 15)})", obras())
+
+        _insert(conn, "INSERT INTO [usuarios obras] VALUES (?, ?, ?)", (
+            (str(o), f"U{rnd.randrange(n_users)}", cargo)
+            for o in range(1, n_obras + 1) for cargo in range(1, 5)
+        ))
+        _insert(conn, "INSERT OR REPLACE INTO movproyecto VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            (
+                e, str(rnd.randint(1, n_obras)), 1, _day(rnd, base, 3000), f"DOC{e // 5}",
+                f"P{rnd.randrange(2000)}", rnd.choice(ACTIVIDADES), round(rnd.uniform(0, 5e4), 2),
+                round(rnd.uniform(0, 4e4), 2), round(rnd.uniform(0, 4e4), 2),
+            )
+            for e in range(1, rows + 1)
+        ))
+        _insert(conn, "INSERT INTO [detalles produccion] VALUES (?, ?, ?, ?)", (
+            (str(rnd.randint(1, n_obras)), rnd.choice([0, 0, 1, 2]), _day(rnd, base, 3000),
+             round(rnd.uniform(0, 1e5), 2))
+            for _ in range(max(1, rows // 4))
+        ))
+        _insert(conn, "INSERT OR REPLACE INTO VERSA VALUES (?, ?)", (
+            (str(o), round(rnd.uniform(-1e5, 1e5), 2)) for o in range(1, n_obras + 1)
+        ))
+        _insert(conn, "INSERT OR REPLACE INTO COSTETOTALOBRAS VALUES (?, ?)", (
+            (str(o), round(rnd.uniform(1e5, 1.5e7), 2)) for o in range(1, n_obras + 1)
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+def isolate_snapshots() -> str:
+    """
+    Apunta las copias locales (local_snapshot) a un directorio temporal para
+    que el benchmark no lea ni pise las de producción. Devuelve el directorio.
+    """
+    from database.sql.local_snapshot import set_snapshot_dir
+    path = tempfile.mkdtemp()
+    set_snapshot_dir(path)
+    return path
+
+def to_sqlite(sql: str) -> str:
+    """
+    Adapta el T-SQL de los scripts a SQLite (quita los prefijos ayu.dbo.) y el
+    límite de filas de la paginación (OFFSET/FETCH) a LIMIT.
+    """
+    return sqlite_sql(re.sub(r"(\[ayu\]|\bayu)\.(\[dbo\]|dbo)\.", "", sql))
+
+class _StandinCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return super().execute(to_sqlite(sql), parameters)
+
+class _StandinConnection(sqlite3.Connection):
+    """Conexión a la BD local que acepta el T-SQL que genera el executor."""
+
+    def cursor(self, factory=_StandinCursor):
+        return super().cursor(factory)
+
+def sqlite_factory(path: str, handshake_ms: float = 0.0) -> Callable[[], Any]:
+    """
+    Factoría de conexiones a la BD local. handshake_ms simula el coste
+    de TLS + login de FreeTDS al abrir cada conexión.
+    """
+    def factory():
+        if handshake_ms:
+            time.sleep(handshake_ms / 1000.0)
+        return sqlite3.connect(path, check_same_thread=False, factory=_StandinConnection)
+    return factory
+
+class _SleepyCursor:
+    def __init__(self, cur, latency_s: float):
+        self._cur = cur
+        self._latency_s = latency_s
+
+    def execute(self, *args):
+        time.sleep(self._latency_s)  # simula la ida y vuelta a Navision
+        return self._cur.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+class _SleepyConnection:
+    """Conexión SQLite que duerme latency_s en cada execute."""
+
+    def __init__(self, conn, latency_s: float):
+        self._conn = conn
+        self._latency_s = latency_s
+
+    def cursor(self):
+        return _SleepyCursor(self._conn.cursor(), self._latency_s)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def sleepy_factory(path: str, query_ms: float) -> Callable[[], Any]:
+    """Factoría de conexiones locales que añaden query_ms de latencia por sentencia."""
+    base = sqlite_factory(path)
+    return lambda: _SleepyConnection(base(), query_ms / 1000.0)
+
+def odbc_factory(conn_str: str) -> Callable[[], Any]:
+    """Factoría contra un DSN ODBC local (p. ej. el driver ODBC de SQLite)."""
+    import pyodbc
+    return lambda: pyodbc.connect(conn_str, timeout=10)
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una BD Navision sintética en SQLite")
+    parser.add_argument("--rows", type=int, default=10_000, help="Filas de movproyecto (1k a 1M)")
+    parser.add_argument("--obras", type=int, default=None, help="Número de obras (por defecto rows/100)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=str, required=True, help="Fichero SQLite de salida")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    build_standin_db(args.out, rows=args.rows, n_obras=args.obras, seed=args.seed)
+    print(f"✅ {args.out} generado en {time.perf_counter() - t0:.1f} s")
+
+if __name__ == "__main__":
+    main()
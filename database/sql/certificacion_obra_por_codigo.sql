@@ -0,0 +1,6 @@
+SELECT
+    COUNT(*) AS movimientos,
+    SUM(m.[Total Price (LCY)]) AS certificacion,
+    MAX(m.[Posting Date]) AS ultimo_movimiento
+FROM movproyecto m
+WHERE m.[Job No_] = ? AND empresa = 1
\ No newline at end of file
@@ -0,0 +1,97 @@
+# database/sql/columnar.py
+"""
+Resultados en formato columnar: un array NumPy tipado por columna y una
+máscara de nulos, en lugar de una lista de dicts por fila.
+NumPy es obligatorio para este formato; pandas y pyarrow solo para los
+traspasos to_dataframe / to_arrow.
+
+Las columnas Decimal (importes de Navision) se convierten en float64 para
+poder operar con ellas en bloque: se pierde la precisión decimal exacta
+(unos 15-16 dígitos significativos). Para importes que deban cuadrar al
+céntimo, usar el formato "rows", que conserva los Decimal.
+"""
+import datetime as dt
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise RuntimeError("El formato columnar necesita numpy (pip install numpy)") from e
+    return np
+
+def _to_array(values: List[Any]):
+    """Convierte una columna en (array tipado, máscara de nulos) de una sola pasada."""
+    np = _numpy()
+    n = len(values)
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=n)
+    sample = next((v for v in values if v is not None), None)
+
+    if sample is None:
+        return np.zeros(n, dtype=np.float64), mask
+    kind = type(sample)
+    if any(v is not None and type(v) is not kind for v in values):
+        return np.array(values, dtype=object), mask
+
+    if kind is bool:
+        return np.array([bool(v) for v in values], dtype=bool), mask
+    if kind is int:
+        return np.array([0 if v is None else v for v in values], dtype=np.int64), mask
+    if kind in (float, Decimal):
+        # object -> float64 convierte todos los Decimal en bloque (con pérdida de precisión)
+        filled = np.array([np.nan if v is None else v for v in values], dtype=object)
+        return filled.astype(np.float64), mask
+    if kind in (dt.datetime, dt.date):
+        # None -> NaT
+        return np.array(values, dtype="datetime64[us]"), mask
+    return np.array(values, dtype=object), mask
+
+def fetch_columnar(cur, arraysize: int) -> Tuple[List[str], Dict[str, Any], Dict[str, Any]]:
+    """
+    Lee el cursor por bloques acumulando directamente por columna
+    y devuelve (columnas, {columna: array}, {columna: máscara de nulos}).
+    """
+    if not cur.description:
+        return [], {}, {}
+    cols = [c[0] for c in cur.description]
+    buffers: List[List[Any]] = [[] for _ in cols]
+    while True:
+        batch = cur.fetchmany(arraysize)
+        if not batch:
+            break
+        for buf, col_values in zip(buffers, zip(*batch)):
+            buf.extend(col_values)
+    data, nulls = {}, {}
+    for name, buf in zip(cols, buffers):
+        data[name], nulls[name] = _to_array(buf)
+    return cols, data, nulls
+
+def to_dataframe(result: Dict[str, Any]):
+    """
+    DataFrame de pandas a partir de un resultado columnar sin copiar los datos:
+    enteros y booleanos con nulos pasan a los arrays nullable de pandas, que
+    reutilizan el array y la máscara tal cual.
+    """
+    import pandas as pd
+
+    columns = {}
+    for name in result["columns"]:
+        values, mask = result["data"][name], result["nulls"][name]
+        if mask.any() and values.dtype.kind == "i":
+            columns[name] = pd.arrays.IntegerArray(values, mask)
+        elif mask.any() and values.dtype.kind == "b":
+            columns[name] = pd.arrays.BooleanArray(values, mask)
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns, copy=False)
+
+def to_arrow(result: Dict[str, Any]):
+    """pyarrow.Table con la máscara de nulos como bitmap de validez."""
+    import pyarrow as pa
+
+    arrays = []
+    for name in result["columns"]:
+        values, mask = result["data"][name], result["nulls"][name]
+        arrays.append(pa.array(values, mask=mask if mask.any() else None, from_pandas=False))
+    return pa.Table.from_arrays(arrays, names=result["columns"])
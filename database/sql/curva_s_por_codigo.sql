@@ -0,0 +1,8 @@
+SELECT
+    dp.[Fecha] AS t,
+    SUM(dp.[Importe]) AS y
+FROM [detalles produccion] dp
+WHERE
+    dp.[Nº Proyecto] = ? AND
+    (dp.[Tipo] = 0 OR dp.[Tipo] = 1)
+GROUP BY dp.[Fecha]
\ No newline at end of file
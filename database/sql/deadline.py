@@ -0,0 +1,121 @@
+# database/sql/deadline.py
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional
+
+class _Watchdog:
+    """
+    Un único hilo que dispara los Deadline armados al vencer (en vez de un Timer por query).
+    Al desarmar, la entrada se marca como muerta y se descarta sin esperar a su
+    vencimiento; el montículo se compacta cuando las muertas son mayoría.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # Entradas [expires_at, seq, deadline]; deadline=None si ya se desarmó
+        self._heap: List[list] = []
+        self._dead = 0
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, deadline: "Deadline") -> None:
+        with self._cond:
+            if deadline._entry is not None:
+                return
+            entry = [deadline.expires_at, next(self._seq), deadline]
+            deadline._entry = entry
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="navision-deadlines", daemon=True)
+                self._thread.start()
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def unwatch(self, deadline: "Deadline") -> None:
+        with self._cond:
+            entry, deadline._entry = deadline._entry, None
+            if entry is None:
+                return
+            was_next = self._heap[0] is entry
+            entry[2] = None
+            self._dead += 1
+            if self._dead > 64 and self._dead * 2 > len(self._heap):
+                self._heap = [e for e in self._heap if e[2] is not None]
+                heapq.heapify(self._heap)
+                self._dead = 0
+            # Si era la próxima en vencer, el hilo vuelve a calcular su espera
+            if was_next:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._heap and self._heap[0][2] is None:
+                    heapq.heappop(self._heap)
+                    self._dead -= 1
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                expires_at, _, deadline = self._heap[0]
+                wait = expires_at - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                deadline._entry = None
+            deadline._fire()
+
+_WATCHDOG = _Watchdog()
+
+class Deadline:
+    """
+    Plazo de una petición. Mientras hay una sentencia en curso se "arma" con la
+    función que la cancela en el servidor (cursor.cancel() en pyodbc): se llama
+    sola al vencer el plazo, o antes si alguien llama a cancel().
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        self.cancelled = False
+        self.fired = False
+        self._lock = threading.Lock()
+        self._cancel_fn: Optional[Callable[[], None]] = None
+        self._entry: Optional[list] = None  # entrada en el watchdog mientras está armado
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.cancelled or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def arm(self, cancel_fn: Callable[[], None]) -> None:
+        with self._lock:
+            self._cancel_fn = cancel_fn
+        if self.expired():
+            self._fire()
+        elif self.expires_at is not None:
+            _WATCHDOG.watch(self)
+
+    def disarm(self) -> None:
+        with self._lock:
+            self._cancel_fn = None
+        _WATCHDOG.unwatch(self)
+
+    def cancel(self) -> None:
+        """Cancela la petición (p. ej. porque el cliente async ya no espera)."""
+        self.cancelled = True
+        self._fire()
+
+    def _fire(self) -> None:
+        with self._lock:
+            fn, self._cancel_fn = self._cancel_fn, None
+        if fn is not None:
+            self.fired = True
+            try:
+                fn()
+            except Exception:
+                pass
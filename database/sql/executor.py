@@ -1,38 +1,662 @@
 # database/executor.py
-from typing import Dict, Any, List
-from pathlib import Path
-from database.sql.navision_connector import get_connection
-from database.sql.registry import REGISTRY
+import asyncio
+import functools
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+from database.sql.columnar import fetch_columnar
+from database.sql.deadline import Deadline
+from database.sql.local_snapshot import SNAPSHOTS, TableSnapshot
+from database.sql.navision_connector import borrow_connection
+from database.sql.pagination import decode_token, encode_token, has_order_by, keyset_sql, limit_sql, sqlite_sql
+from database.sql.registry import REGISTRY, QuerySpec, BATCH_KEY_ALIAS, build_batch_sql, get_sql
+from database.sql.result_cache import RESULT_CACHE, normalize_param
+from database.sql.singleflight import SingleFlight
+from database.sql import slow_query_log, tracing
+from database.sql.slow_query_log import QueryTimings
 
-def _read_sql(path: str) -> str:
-    sql = Path(path).read_text(encoding="utf-8")
-    return sql
+logger = logging.getLogger(__name__)
+
+# Valores por sentencia en execute_many (SQL Server admite como mucho 2100 parámetros)
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", "500"))
+
+# Filas por fetchmany al leer resultados
+STREAM_ARRAYSIZE = int(os.environ.get("STREAM_ARRAYSIZE", "1000"))
+
+# Hilos dedicados a las llamadas ODBC bloqueantes de la API async
+# (por defecto, tantos como conexiones admite el pool)
+ASYNC_WORKERS = int(os.environ.get("NAVISION_ASYNC_WORKERS", os.environ.get("NAVISION_POOL_MAX_SIZE", "8")))
+
+# Peticiones idénticas en curso (p. ej. un dashboard refrescando a la vez)
+_IN_FLIGHT = SingleFlight()
+
+_WORKERS: Optional[ThreadPoolExecutor] = None
+_WORKERS_LOCK = threading.Lock()
+
+def get_worker_pool() -> ThreadPoolExecutor:
+    """Pool de hilos acotado en el que se ejecuta el trabajo ODBC bloqueante."""
+    global _WORKERS
+    with _WORKERS_LOCK:
+        if _WORKERS is None:
+            _WORKERS = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="navision-sql")
+        return _WORKERS
 
 def _build_positional_args(intent: Dict[str, Any], param_order: List[str]) -> tuple:
-    # Convierte dict → tupla en el orden exacto de los "?"
-    return tuple(intent[p] for p in param_order)
+    # Convierte dict → tupla en el orden exacto de los "?", con los mismos valores
+    # normalizados que la clave de caché (la copia local no ignora espacios finales)
+    return tuple(normalize_param(intent[p]) for p in param_order)
+
+def _page_size(spec: QuerySpec, intent: Dict[str, Any]) -> Optional[int]:
+    # page_size del intent, acotado por spec.max_rows
+    size = intent.get("page_size") or spec.max_rows
+    if size is None:
+        return None
+    return min(int(size), spec.max_rows) if spec.max_rows is not None else int(size)
+
+def _paged_sql(
+    qk: str, spec: QuerySpec, intent: Dict[str, Any], sql: str, args: tuple, limit: Optional[int]
+) -> Tuple[str, tuple]:
+    # Página pedida (page_token) y límite de filas, aplicados en el servidor:
+    # se piden limit + 1 filas solo para saber si hay otra página
+    params = args
+    if spec.page_key is not None:
+        after = decode_token(intent.get("page_token"), qk, params)
+        sql = keyset_sql(sql, spec.page_key, after is not None, limited=limit is not None)
+        if after is not None:
+            args += (after,)
+    elif intent.get("page_token"):
+        raise ValueError(f"'{qk}' no declara page_key: no admite page_token")
+    elif limit is not None and not has_order_by(sql):
+        sql = limit_sql(sql)
+    else:
+        return sql, args  # sin límite, o una query con ORDER BY: se corta al leer
+    if limit is not None:
+        args += (limit + 1,)
+    return sql, args
+
+def _cache_key(qk: str, spec: QuerySpec, intent: Dict[str, Any]) -> tuple:
+    # Solo los parámetros que llegan al SQL (y la página pedida) distinguen un resultado de otro
+    key = (qk, tuple(normalize_param(intent[p]) for p in spec.param_order))
+    if spec.page_key is not None or _page_size(spec, intent) is not None:
+        key += (intent.get("page_token"), _page_size(spec, intent))
+    return key
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Copia las filas para que el llamador no pueda alterar lo cacheado
+    return {**result, "rows": [dict(r) for r in result["rows"]]}
+
+def _check_required(qk: str, spec: QuerySpec, intent: Dict[str, Any]) -> None:
+    missing = [p for p in spec.required_params if p not in intent or intent[p] is None]
+    if missing:
+        raise ValueError(f"Faltan parámetros requeridos {missing} para '{qk}'")
+
+def _clean_row(cols: List[str], values) -> Dict[str, Any]:
+    # Limpieza: quitar campos None (tu UI no los quiere mostrar)
+    return {k: v for k, v in zip(cols, values) if v is not None}
+
+def _iter_clean_rows(
+    cur, arraysize: int, timings: Optional[QueryTimings] = None
+) -> Iterator[Dict[str, Any]]:
+    # Lee por bloques: en memoria solo hay un bloque de filas crudas a la vez
+    if not cur.description:
+        return
+    cols = [c[0] for c in cur.description]
+    while True:
+        t0 = time.perf_counter()
+        batch = cur.fetchmany(arraysize)
+        t1 = time.perf_counter()
+        if not batch:
+            if timings is not None:
+                timings.add("fetch", t1 - t0)
+            return
+        with tracing.span("sql.cleanup", rows=len(batch)):
+            cleaned = [_clean_row(cols, r) for r in batch]
+        if timings is not None:
+            timings.add("fetch", t1 - t0)
+            timings.add("transform", time.perf_counter() - t1)
+        yield from cleaned
+
+def _set_query_timeout(conn, seconds: int) -> None:
+    # SQL_ATTR_QUERY_TIMEOUT: al vencer, el driver cancela la sentencia en el servidor
+    try:
+        conn.timeout = seconds
+    except (AttributeError, TypeError):
+        pass  # driver sin timeout de sentencia (p. ej. sqlite3): queda el watchdog
+
+def _cancel_fn(conn, cur) -> Optional[Callable[[], None]]:
+    # pyodbc: cursor.cancel() (SQLCancel); sqlite3: connection.interrupt()
+    return getattr(cur, "cancel", None) or getattr(conn, "interrupt", None)
 
-def execute_query(intent: Dict[str, Any]) -> Dict[str, Any]:
+def _capture_plan(conn, sql: str, args: tuple, deadline: Deadline) -> Optional[str]:
+    # El plan de una query lenta se pide con lo que le quede de plazo (como mucho
+    # SLOW_QUERY_PLAN_TIMEOUT): si ya venció, la entrada del log va sin plan
+    remaining = deadline.remaining()
+    seconds = slow_query_log.SLOW_QUERY_PLAN_TIMEOUT if remaining is None else min(
+        remaining, slow_query_log.SLOW_QUERY_PLAN_TIMEOUT)
+    if deadline.expired() or seconds <= 0:
+        return None
+    _set_query_timeout(conn, max(1, math.ceil(seconds)))
+    try:
+        return slow_query_log.capture_plan(conn, sql, args)
+    finally:
+        _set_query_timeout(conn, 0)
+
+class _Statement:
+    """Sentencia en curso dentro de _statement: cursor ya ejecutado y tiempos por fase."""
+
+    def __init__(self, cur, timings: QueryTimings):
+        self.cur = cur
+        self.timings = timings
+        self.rowcount = 0  # lo fija quien lee, para el span y el slow-query log
+
+@contextmanager
+def _statement(
+    qk: str,
+    sql: str,
+    args: tuple,
+    pooled: bool,
+    deadline: Optional[Deadline] = None,
+    local: Optional[TableSnapshot] = None,
+) -> Iterator[_Statement]:
+    """
+    Ejecuta una sentencia midiendo cada fase y deja leer el cursor dentro del
+    with; si supera el umbral de NAVISION_SLOW_QUERY_MS la apunta en el
+    slow-query log (con el plan, si se pide, acotado por lo que quede del plazo).
+    Con deadline, el plazo limita la espera de conexión, fija el timeout de
+    sentencia y un watchdog cancela en el servidor lo que siga en curso al
+    vencer (también la lectura). La conexión vuelve al pool sin timeout y con
+    rollback; si quedó inservible, el pool la descarta.
+    Con local, la sentencia se ejecuta contra esa copia local en vez de Navision.
+    """
+    deadline = deadline or Deadline()
+    timings = QueryTimings()
+    with tracing.span("sql.statement", query_key=qk, source="local" if local is not None else "navision") as sp:
+        t0 = time.perf_counter()
+        try:
+            source = local.connection() if local is not None else borrow_connection(pooled, timeout=deadline.remaining())
+            with source as conn:
+                timings.add("connect", time.perf_counter() - t0)
+                remaining = deadline.remaining()
+                if deadline.expired():
+                    raise TimeoutError(f"La query '{qk}' agotó su plazo esperando conexión")
+                if remaining is not None:
+                    _set_query_timeout(conn, max(1, math.ceil(remaining)))
+                cur = conn.cursor()
+                cancel = _cancel_fn(conn, cur)
+                if cancel is not None:
+                    deadline.arm(cancel)
+                try:
+                    with timings.phase("execute"), tracing.span("sql.execute"):
+                        cur.execute(sql, args)
+                    st = _Statement(cur, timings)
+                    yield st
+                finally:
+                    deadline.disarm()
+                    cur.close()
+                    if remaining is not None:
+                        _set_query_timeout(conn, 0)
+                if slow_query_log.is_slow(timings):
+                    plan = _capture_plan(conn, sql, args, deadline) if slow_query_log.SLOW_QUERY_SHOWPLAN else None
+                    slow_query_log.record(qk, sql, args, st.rowcount, timings, plan)
+        except Exception as e:
+            if deadline.expired() and not isinstance(e, TimeoutError):
+                raise TimeoutError(f"La query '{qk}' superó su plazo y se canceló en el servidor") from e
+            raise
+        sp.set(rows=st.rowcount, **{f"{k}_ms": round(v, 3) for k, v in timings.phases.items()})
+
+def _run_statement(
+    qk: str,
+    sql: str,
+    args: tuple,
+    pooled: bool,
+    read: Callable[[Any, QueryTimings], Any],
+    rowcount: Callable[[Any], int],
+    deadline: Optional[Deadline] = None,
+    local: Optional[TableSnapshot] = None,
+) -> Any:
+    """_statement leyendo el resultado entero con read(cursor, timings)."""
+    with _statement(qk, sql, args, pooled, deadline, local) as st:
+        out = read(st.cur, st.timings)
+        st.rowcount = rowcount(out)
+    return out
+
+def _fresh_snapshot(spec: QuerySpec) -> Optional[TableSnapshot]:
+    # Copia local de la spec si está al día; si es inexistente o más antigua de
+    # lo permitido, se sirve de Navision y se pone al día en segundo plano
+    snapshot = SNAPSHOTS[spec.local_snapshot] if spec.local_snapshot else None
+    if snapshot is None:
+        return None
+    if snapshot.is_fresh():
+        return snapshot
+    snapshot.refresh_in_background()
+    return None
+
+def _run_spec_statement(
+    qk: str,
+    spec: QuerySpec,
+    sql: str,
+    args: tuple,
+    pooled: bool,
+    read: Callable[[Any, QueryTimings], Any],
+    rowcount: Callable[[Any], int],
+    deadline: Deadline,
+) -> Tuple[Any, bool]:
+    """
+    _run_statement contra la copia local si la spec declara local_snapshot y
+    está al día; si no, contra Navision (y la copia se pone al día en segundo plano).
+    Devuelve (resultado, servido desde la copia local).
+    """
+    snapshot = _fresh_snapshot(spec)
+    if snapshot is not None:
+        try:
+            return _run_statement(qk, sqlite_sql(sql), args, pooled, read=read, rowcount=rowcount,
+                                  deadline=deadline, local=snapshot), True
+        except sqlite3.Error as e:
+            logger.warning("'%s' no se pudo servir desde la copia local (%s); se consulta Navision", qk, e)
+    return _run_statement(qk, sql, args, pooled, read=read, rowcount=rowcount, deadline=deadline), False
+
+def cache_stats() -> Dict[str, int]:
+    """Contadores de la caché de resultados (hits, misses, evictions, bytes...)."""
+    return RESULT_CACHE.stats()
+
+def coalesce_stats() -> Dict[str, int]:
+    """Llamadas ejecutadas frente a las que se agruparon con otra idéntica en curso."""
+    return _IN_FLIGHT.stats()
+
+def execute_query(
+    intent: Dict[str, Any],
+    pooled: bool = True,
+    use_cache: bool = True,
+    format: str = "rows",
+    coalesce: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
     """
     intent = {"query_key": "...", "<param>": ...}
+    Por defecto toma prestada una conexión del pool; pooled=False abre una nueva.
+    Los resultados se cachean según spec.cache_ttl; use_cache=False fuerza la consulta.
+    format="columnar" devuelve un array NumPy por columna ("data") y su máscara de
+    nulos ("nulls") en lugar de "rows"; ese formato no pasa por la caché (ver
+    columnar.py para los tipos: los Decimal pasan a float64).
+    Con coalesce=True, las llamadas idénticas que llegan mientras otra está en curso
+    esperan y comparten su resultado (o su excepción) en vez de ir a la BD; la
+    sentencia compartida corre con spec.timeout_s y el timeout de cada llamada
+    solo limita cuánto espera esa llamada.
+    timeout (segundos, por defecto spec.timeout_s) es el plazo total: al vencer se
+    cancela la sentencia en el servidor y se lanza TimeoutError. Se puede pasar un
+    Deadline ya creado para cancelarla desde fuera.
+    Si la spec declara max_rows/page_key (o el intent trae "page_size"), se devuelve
+    como mucho una página, con "truncated" y "next_page_token"; para la siguiente se
+    repite el intent con "page_token", en cualquiera de los dos formatos.
     """
+    with tracing.span("sql", query_key=intent.get("query_key")) as sp:
+        result = _execute_query(intent, pooled, use_cache, format, coalesce, timeout, deadline)
+        sp.set(rowcount=result.get("rowcount"))
+    return result
+
+def _execute_query(
+    intent: Dict[str, Any],
+    pooled: bool,
+    use_cache: bool,
+    format: str,
+    coalesce: bool,
+    timeout: Optional[float],
+    deadline: Optional[Deadline],
+) -> Dict[str, Any]:
     qk = intent["query_key"]
     spec = REGISTRY[qk]
+    if format not in ("rows", "columnar"):
+        raise ValueError(f"Formato desconocido '{format}' (usa 'rows' o 'columnar')")
 
     # Validación de requeridos
-    missing = [p for p in spec.required_params if p not in intent or intent[p] is None]
-    if missing:
-        raise ValueError(f"Faltan parámetros requeridos {missing} para '{qk}'")
+    _check_required(qk, spec, intent)
+
+    if deadline is None:
+        deadline = Deadline(timeout if timeout is not None else spec.timeout_s)
 
-    sql = _read_sql(spec.sql_path)
+    cache_key = _cache_key(qk, spec, intent)
+    if format == "columnar":
+        if not coalesce:
+            return _execute_columnar(qk, spec, intent, pooled, deadline)
+        # Los arrays se comparten entre las llamadas agrupadas: tratarlos como solo lectura
+        shared_deadline = Deadline(spec.timeout_s)
+        result, _ = _IN_FLIGHT.share(
+            ("columnar", cache_key),
+            tracing.with_context(lambda: _execute_columnar(qk, spec, intent, pooled, shared_deadline)),
+            deadline=deadline,
+            on_abandon=shared_deadline.cancel,
+        )
+        return result
+
+    if use_cache and spec.cache_ttl > 0:
+        cached = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            tracing.annotate(cache="hit")
+            return _copy_result(cached)
+
+    def _fetch(run_deadline: Deadline) -> Dict[str, Any]:
+        sql = get_sql(qk)
+        args = params = _build_positional_args(intent, spec.param_order)
+        limit = _page_size(spec, intent)
+        sql, args = _paged_sql(qk, spec, intent, sql, args, limit)
+
+        def _read(cur, timings: QueryTimings) -> List[Dict[str, Any]]:
+            if limit is None:
+                return list(_iter_clean_rows(cur, STREAM_ARRAYSIZE, timings))
+            # El servidor ya devuelve como mucho limit + 1 filas; islice cubre las
+            # queries con ORDER BY, que no se pueden envolver
+            rows_iter = _iter_clean_rows(cur, min(STREAM_ARRAYSIZE, limit + 1), timings)
+            return list(itertools.islice(rows_iter, limit + 1))
+
+        rows, served_locally = _run_spec_statement(qk, spec, sql, args, pooled, read=_read, rowcount=len,
+                                                   deadline=run_deadline)
+        result = {"query_key": qk, "rowcount": len(rows), "rows": rows}
+        if limit is not None:
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            token = None
+            if has_more and spec.page_key is not None:
+                last_key = rows[-1].get(spec.page_key)
+                if last_key is None:
+                    raise ValueError(f"'{qk}': la columna page_key '{spec.page_key}' no puede ser nula")
+                token = encode_token(qk, params, last_key)
+            result = {
+                "query_key": qk, "rowcount": len(rows), "rows": rows,
+                "truncated": has_more, "next_page_token": token,
+            }
+        # Lo servido desde la copia local no se cachea: ya es inmediato y la
+        # caché debe reflejar siempre lo que devuelve Navision
+        if spec.cache_ttl > 0 and not served_locally:
+            RESULT_CACHE.set(cache_key, result, spec.cache_ttl)
+        return result
+
+    if not coalesce:
+        return _copy_result(_fetch(deadline))
+    # La sentencia compartida corre con el plazo de la spec, no con el de quien
+    # llegó primero: cada llamador solo deja de esperar al vencer (o cancelarse)
+    # su deadline, y se cancela en el servidor cuando ya no la espera nadie.
+    # Cada llamador recibe su propia copia de las filas compartidas
+    shared_deadline = Deadline(spec.timeout_s)
+    result, shared = _IN_FLIGHT.share(
+        ("rows", cache_key),
+        tracing.with_context(lambda: _fetch(shared_deadline)),
+        deadline=deadline,
+        on_abandon=shared_deadline.cancel,
+    )
+    if shared:
+        tracing.annotate(coalesced=True)
+    return _copy_result(result)
+
+
+def _execute_columnar(
+    qk: str, spec: QuerySpec, intent: Dict[str, Any], pooled: bool, deadline: Deadline
+) -> Dict[str, Any]:
+    args = params = _build_positional_args(intent, spec.param_order)
+    limit = _page_size(spec, intent)
+    sql, args = _paged_sql(qk, spec, intent, get_sql(qk), args, limit)
+
+    def _read(cur, timings: QueryTimings):
+        with timings.phase("fetch"):
+            return fetch_columnar(cur, STREAM_ARRAYSIZE if limit is None else min(STREAM_ARRAYSIZE, limit + 1))
+
+    def _count(out) -> int:
+        cols, data, _ = out
+        return len(data[cols[0]]) if cols else 0
+
+    out, _ = _run_spec_statement(qk, spec, sql, args, pooled, read=_read, rowcount=_count, deadline=deadline)
+    cols, data, nulls = out
+    result = {"query_key": qk, "rowcount": _count(out), "columns": cols, "data": data, "nulls": nulls}
+    if limit is not None:
+        # Misma página que el formato "rows": se leyó una fila de más para saber si hay otra
+        has_more = result["rowcount"] > limit
+        if has_more:
+            data = {c: a[:limit] for c, a in data.items()}
+            nulls = {c: m[:limit] for c, m in nulls.items()}
+        token = None
+        if has_more and spec.page_key is not None:
+            if nulls[spec.page_key][limit - 1]:
+                raise ValueError(f"'{qk}': la columna page_key '{spec.page_key}' no puede ser nula")
+            last_key = data[spec.page_key][limit - 1]
+            token = encode_token(qk, params, last_key.item() if hasattr(last_key, "item") else last_key)
+        result.update(rowcount=min(result["rowcount"], limit), data=data, nulls=nulls,
+                      truncated=has_more, next_page_token=token)
+    return result
+
+def iter_query(
+    intent: Dict[str, Any],
+    arraysize: int = STREAM_ARRAYSIZE,
+    pooled: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Versión en streaming de execute_query para resultados grandes: devuelve un
+    generador de filas limpias leídas con fetchmany(arraysize), sin pasar por la
+    caché ni por la paginación. La conexión queda prestada hasta agotar o cerrar
+    el generador (usar contextlib.closing si se puede abandonar a medias).
+    Como execute_query, se sirve de la copia local si está al día, deja traza y
+    slow-query log, y timeout/deadline limitan la lectura entera: al vencer se
+    cancela en el servidor aunque el consumidor vaya lento (para un volcado sin
+    plazo, pasar deadline=Deadline()).
+    """
+    qk = intent["query_key"]
+    spec = REGISTRY[qk]
+    _check_required(qk, spec, intent)
+    sql = get_sql(qk)
     args = _build_positional_args(intent, spec.param_order)
+    if deadline is None:
+        deadline = Deadline(timeout if timeout is not None else spec.timeout_s)
+
+    def _stream(local: Optional[TableSnapshot]) -> Iterator[Dict[str, Any]]:
+        with _statement(qk, sqlite_sql(sql) if local is not None else sql, args, pooled, deadline, local) as st:
+            for row in _iter_clean_rows(st.cur, arraysize, st.timings):
+                st.rowcount += 1
+                yield row
+
+    def _rows() -> Iterator[Dict[str, Any]]:
+        snapshot = _fresh_snapshot(spec)
+        if snapshot is not None:
+            sent = 0
+            try:
+                for row in _stream(snapshot):
+                    sent += 1
+                    yield row
+                return
+            except sqlite3.Error as e:
+                # Con filas ya entregadas no se puede reintentar sin duplicarlas
+                if sent:
+                    raise
+                logger.warning("'%s' no se pudo servir desde la copia local (%s); se consulta Navision", qk, e)
+        yield from _stream(None)
+
+    return _rows()
 
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, args)
-        cols = [c[0] for c in cur.description] if cur.description else []
-        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-        # Limpieza: quitar campos None (tu UI no los quiere mostrar)
-        rows = [{k: v for k, v in row.items() if v is not None} for row in rows]
+def stream_query(
+    intent: Dict[str, Any],
+    on_row: Callable[[Dict[str, Any]], None],
+    arraysize: int = STREAM_ARRAYSIZE,
+    pooled: bool = True,
+    timeout: Optional[float] = None,
+) -> int:
+    """Llama on_row por cada fila (p. ej. para volcar a disco) y devuelve cuántas hubo."""
+    n = 0
+    for row in iter_query(intent, arraysize=arraysize, pooled=pooled, timeout=timeout):
+        on_row(row)
+        n += 1
+    return n
 
-    return {"query_key": qk, "rowcount": len(rows), "rows": rows}
+def _batch_key(value: Any) -> str:
+    # SQL Server compara códigos sin distinguir mayúsculas ni espacios finales
+    return str(value).strip().casefold()
+
+def execute_many(
+    query_key: str,
+    params_list: List[Dict[str, Any]],
+    pooled: bool = True,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta la misma query para muchos parámetros (p. ej. 200 obras).
+    Si la spec declara batch_column, agrupa los valores en IN (...) de hasta
+    BATCH_CHUNK_SIZE y reparte las filas; si no, ejecuta una a una.
+    Devuelve un resultado por entrada, en el mismo orden.
+    """
+    spec = REGISTRY[query_key]
+    intents = [{**p, "query_key": query_key} for p in params_list]
+    if spec.batch_column is None:
+        return [execute_query(i, pooled=pooled, use_cache=use_cache) for i in intents]
+
+    for intent in intents:
+        _check_required(query_key, spec, intent)
+
+    param = spec.param_order[0]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(intents)
+    pending: Dict[str, List[int]] = {}  # clave normalizada -> posiciones de entrada
+    for idx, intent in enumerate(intents):
+        if use_cache and spec.cache_ttl > 0:
+            cached = RESULT_CACHE.get(_cache_key(query_key, spec, intent))
+            if cached is not None:
+                results[idx] = _copy_result(cached)
+                continue
+        pending.setdefault(_batch_key(intent[param]), []).append(idx)
+
+    if pending:
+        keys = list(pending)
+        rows_by_key: Dict[str, List[Dict[str, Any]]] = {k: [] for k in keys}
+        served_locally: set = set()
+        sql = get_sql(query_key)
+
+        def _read(cur, timings: QueryTimings) -> tuple:
+            cols = [c[0] for c in cur.description] if cur.description else []
+            with timings.phase("fetch"):
+                return cols, cur.fetchall()
+
+        for start in range(0, len(keys), BATCH_CHUNK_SIZE):
+            chunk = keys[start:start + BATCH_CHUNK_SIZE]
+            args = tuple(normalize_param(intents[pending[k][0]][param]) for k in chunk)
+            # Cada trozo es una sentencia como las de execute_query: mismo plazo, log y copia local
+            (cols, fetched), local = _run_spec_statement(
+                query_key, spec, build_batch_sql(sql, spec.batch_column, len(chunk)), args, pooled,
+                read=_read, rowcount=lambda out: len(out[1]), deadline=Deadline(spec.timeout_s),
+            )
+            if local:
+                served_locally.update(chunk)
+            key_pos = cols.index(BATCH_KEY_ALIAS)
+            data_cols = cols[:key_pos] + cols[key_pos + 1:]
+            with tracing.span("sql.cleanup", rows=len(fetched)):
+                for r in fetched:
+                    r = tuple(r)
+                    bucket = rows_by_key.get(_batch_key(r[key_pos]))
+                    if bucket is not None:
+                        bucket.append(_clean_row(data_cols, r[:key_pos] + r[key_pos + 1:]))
+
+        for k in keys:
+            rows = rows_by_key[k]
+            result = {"query_key": query_key, "rowcount": len(rows), "rows": rows}
+            first = pending[k][0]
+            if spec.cache_ttl > 0 and k not in served_locally:
+                RESULT_CACHE.set(_cache_key(query_key, spec, intents[first]), _copy_result(result), spec.cache_ttl)
+            results[first] = result
+            for idx in pending[k][1:]:
+                results[idx] = _copy_result(result)
+
+    return results
+
+def execute_intents(
+    intents: List[Dict[str, Any]],
+    pooled: bool = True,
+    use_cache: bool = True,
+) -> List[Any]:
+    """
+    Ejecuta muchos intents (de queries distintas) a la vez en el pool de hilos.
+    Los de una query con batch_column se agrupan con execute_many y los
+    repetidos se ejecutan una sola vez. Devuelve, en el mismo orden, el
+    resultado o la excepción de cada intent: un fallo no tumba al resto.
+    """
+    results: List[Any] = [None] * len(intents)
+    batches: Dict[str, List[int]] = {}     # query_key -> posiciones
+    singles: Dict[tuple, List[int]] = {}   # clave de caché -> posiciones
+    for idx, intent in enumerate(intents):
+        try:
+            qk = intent["query_key"]
+            spec = REGISTRY[qk]
+            _check_required(qk, spec, intent)
+            key = _cache_key(qk, spec, intent)
+        except KeyError as e:
+            results[idx] = ValueError(f"Intent inválido {intent}: no existe {e}")
+            continue
+        except ValueError as e:
+            results[idx] = e
+            continue
+        if spec.batch_column is not None and set(intent) - {"query_key"} == set(spec.param_order):
+            batches.setdefault(qk, []).append(idx)
+        else:
+            singles.setdefault(key, []).append(idx)
+
+    pool = get_worker_pool()
+    batch_futures = [
+        (qk, positions, pool.submit(
+            tracing.with_context(execute_many), qk, [{p: intents[i][p] for p in REGISTRY[qk].param_order} for i in positions],
+            pooled, use_cache,
+        ))
+        for qk, positions in batches.items()
+    ]
+    single_futures = [
+        (positions, pool.submit(tracing.with_context(execute_query), intents[positions[0]], pooled, use_cache))
+        for positions in singles.values()
+    ]
+
+    for qk, positions, future in batch_futures:
+        try:
+            for idx, result in zip(positions, future.result()):
+                results[idx] = result
+        except Exception:
+            # Si falla el lote se repite uno a uno para aislar el intent problemático
+            single_futures += [
+                ([idx], pool.submit(tracing.with_context(execute_query), intents[idx], pooled, use_cache))
+                for idx in positions
+            ]
+    for positions, future in single_futures:
+        try:
+            result = future.result()
+        except Exception as e:
+            for idx in positions:
+                results[idx] = e
+            continue
+        results[positions[0]] = result
+        for idx in positions[1:]:
+            results[idx] = _copy_result(result)
+    return results
+
+async def execute_query_async(
+    intent: Dict[str, Any],
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Versión async de execute_query: la llamada ODBC corre en el pool de hilos
+    acotado, así que el event loop sigue atendiendo a otros usuarios.
+    timeout (segundos, por defecto spec.timeout_s) lanza TimeoutError. Si la
+    petición vence o se cancela antes de empezar no llega a ejecutarse; si ya
+    estaba en curso, la sentencia se cancela en el servidor.
+    """
+    spec = REGISTRY[intent["query_key"]]
+    deadline = Deadline(timeout if timeout is not None else spec.timeout_s)
+    loop = asyncio.get_running_loop()
+    # run_in_executor no copia el contexto: el request id viaja con with_context
+    fut = loop.run_in_executor(
+        get_worker_pool(), functools.partial(tracing.with_context(execute_query), intent, deadline=deadline, **kwargs)
+    )
+    try:
+        return await asyncio.wait_for(fut, deadline.remaining())
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        deadline.cancel()
+        raise
@@ -0,0 +1,3 @@
+SELECT v.[K DE PIR] AS kpir
+FROM [VERSA] v
+WHERE v.[obra] = ?
\ No newline at end of file
@@ -0,0 +1,253 @@
+# database/sql/local_snapshot.py
+"""
+Copia local (SQLite) de tablas maestras de Navision que se leen en casi todas
+las peticiones, empezando por [obras ayu]. Se sincroniza de forma incremental
+con [Last Date Modified] y el executor sirve desde aquí las queries marcadas con
+QuerySpec.local_snapshot mientras la copia no supere la antigüedad configurada.
+
+Uso (desde la raíz del proyecto, p. ej. en un cron):
+    python -m database.sql.local_snapshot            # incremental
+    python -m database.sql.local_snapshot --full     # recarga completa
+"""
+import argparse
+import datetime as dt
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from database.sql.navision_connector import borrow_connection
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get("NAVISION_SNAPSHOT_DIR", str(PROJECT_ROOT / "data" / "snapshots"))
+# Antigüedad máxima (s) con la que se sirve desde la copia local; si se supera se va a Navision
+SNAPSHOT_MAX_STALENESS = float(os.environ.get("NAVISION_SNAPSHOT_MAX_STALENESS", "900"))
+# Cada cuánto (s) la sincronización hace recarga completa para recoger borrados
+SNAPSHOT_FULL_EVERY = float(os.environ.get("NAVISION_SNAPSHOT_FULL_EVERY", "86400"))
+# Espera mínima (s) entre intentos de sincronización en segundo plano
+SNAPSHOT_RETRY_AFTER = 60.0
+# Cada cuánto (s) se relee la marca de sincronización (la puede actualizar otro proceso)
+SNAPSHOT_META_TTL = 5.0
+SNAPSHOT_ARRAYSIZE = 5000
+
+# Los tipos se declaran para que SQLite devuelva los mismos tipos Python que pyodbc
+sqlite3.register_converter("NAV_DECIMAL", lambda b: Decimal(b.decode()))
+sqlite3.register_converter("NAV_DATETIME", lambda b: dt.datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("NAV_DATE", lambda b: dt.date.fromisoformat(b.decode()))
+
+def _decl_type(py_type: Any) -> str:
+    if py_type is Decimal:
+        return "NAV_DECIMAL"
+    if py_type is dt.datetime:
+        return "NAV_DATETIME"
+    if py_type is dt.date:
+        return "NAV_DATE"
+    return ""
+
+def _nav_collation(a: str, b: str) -> int:
+    # Como la intercalación de Navision: sin distinguir mayúsculas ni espacios finales
+    a, b = a.rstrip().casefold(), b.rstrip().casefold()
+    return (a > b) - (a < b)
+
+def _watermark_str(v: Any) -> str:
+    return v.isoformat() if isinstance(v, dt.date) else str(v)
+
+def _watermark_param(s: str) -> Any:
+    # Se devuelve con el mismo tipo con el que se leyó (fecha o fecha-hora)
+    try:
+        return dt.datetime.fromisoformat(s) if "T" in s else dt.date.fromisoformat(s)
+    except ValueError:
+        return s
+
+def _to_sqlite(v: Any) -> Any:
+    if isinstance(v, (Decimal, dt.date)):  # dt.datetime es subclase de dt.date
+        return str(v) if isinstance(v, Decimal) else v.isoformat()
+    return v
+
+class TableSnapshot:
+    """Copia local de una tabla remota con clave primaria y columna de última modificación."""
+
+    def __init__(self, name: str, table: str, key_column: str, modified_column: str):
+        self.name = name
+        self.table = table
+        self.key_column = key_column
+        self.modified_column = modified_column
+        self.path = os.path.join(SNAPSHOT_DIR, f"{name}.sqlite")
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._last_attempt = 0.0
+        self._attempt_lock = threading.Lock()
+        self._meta_cache: Optional[Dict[str, Any]] = None
+        self._meta_read_at = 0.0
+
+    # --- lectura ---
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        conn.create_collation("NAV", _nav_collation)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS _snapshot_meta ("
+            "name TEXT PRIMARY KEY, watermark TEXT, synced_at REAL, full_at REAL, rows INTEGER)"
+        )
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Conexión local reutilizada por hilo (lecturas en microsegundos)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        yield conn
+
+    def meta(self) -> Optional[Dict[str, Any]]:
+        if self._meta_cache is None or time.monotonic() - self._meta_read_at > SNAPSHOT_META_TTL:
+            with self.connection() as conn:
+                row = conn.execute(
+                    "SELECT watermark, synced_at, full_at, rows FROM _snapshot_meta WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+            if row is None:
+                return None
+            self._meta_cache = dict(zip(("watermark", "synced_at", "full_at", "rows"), row))
+            self._meta_read_at = time.monotonic()
+        return self._meta_cache
+
+    def age(self) -> Optional[float]:
+        """Segundos desde la última sincronización (None si nunca se sincronizó)."""
+        meta = self.meta()
+        return None if meta is None else time.time() - meta["synced_at"]
+
+    def is_fresh(self, max_staleness: float = SNAPSHOT_MAX_STALENESS) -> bool:
+        if max_staleness <= 0:
+            return False
+        age = self.age()
+        return age is not None and age <= max_staleness
+
+    # --- sincronización ---
+    def refresh(self, full: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Trae de Navision las filas modificadas desde la última marca de agua
+        (>=, porque [Last Date Modified] es una fecha) y las inserta o actualiza.
+        Con full=True (o si toca por SNAPSHOT_FULL_EVERY) recarga la tabla entera.
+        """
+        with self._refresh_lock:
+            meta = self.meta()
+            if meta is None:
+                full = True  # sin marca de agua no hay incremental posible
+            elif full is None:
+                full = time.time() - (meta["full_at"] or 0) > SNAPSHOT_FULL_EVERY
+            sql = f"SELECT * FROM [{self.table}]"
+            args: tuple = ()
+            if not full and meta["watermark"]:
+                sql += f" WHERE [{self.modified_column}] >= ?"
+                args = (_watermark_param(meta["watermark"]),)
+
+            t0 = time.perf_counter()
+            n, watermark = 0, meta["watermark"] if meta and not full else None
+            local = self._connect()
+            try:
+                with borrow_connection() as remote:
+                    cur = remote.cursor()
+                    try:
+                        cur.execute(sql, args)
+                        cols = [c[0] for c in cur.description]
+                        staging = "_staging" if full else f"[{self.table}]"
+                        if full:
+                            local.execute("DROP TABLE IF EXISTS _staging")
+                            self._create_table(local, "_staging", cur.description)
+                        else:
+                            self._create_table(local, f"[{self.table}]", cur.description)
+                        insert = (
+                            f"INSERT OR REPLACE INTO {staging} ({', '.join(f'[{c}]' for c in cols)}) "
+                            f"VALUES ({', '.join('?' * len(cols))})"
+                        )
+                        mod_idx = cols.index(self.modified_column)
+                        while True:
+                            batch = cur.fetchmany(SNAPSHOT_ARRAYSIZE)
+                            if not batch:
+                                break
+                            local.executemany(insert, [tuple(_to_sqlite(v) for v in r) for r in batch])
+                            n += len(batch)
+                            mods = [r[mod_idx] for r in batch if r[mod_idx] is not None]
+                            if mods:
+                                top = _watermark_str(max(mods))
+                                watermark = top if watermark is None else max(watermark, top)
+                    finally:
+                        cur.close()
+                if full:
+                    local.execute(f"DROP TABLE IF EXISTS [{self.table}]")
+                    local.execute(f"ALTER TABLE _staging RENAME TO [{self.table}]")
+                total = local.execute(f"SELECT COUNT(*) FROM [{self.table}]").fetchone()[0]
+                now = time.time()
+                local.execute(
+                    "INSERT OR REPLACE INTO _snapshot_meta VALUES (?, ?, ?, ?, ?)",
+                    (self.name, watermark, now, now if full else meta["full_at"], total),
+                )
+                local.commit()
+            finally:
+                local.close()
+            self._meta_cache = None
+            return {
+                "snapshot": self.name, "full": full, "fetched": n, "rows": total,
+                "watermark": watermark, "seconds": round(time.perf_counter() - t0, 3),
+            }
+
+    def refresh_in_background(self) -> bool:
+        """Lanza una sincronización en segundo plano si no hay otra en curso ni reciente."""
+        with self._attempt_lock:
+            now = time.monotonic()
+            if self._refresh_lock.locked() or now - self._last_attempt < SNAPSHOT_RETRY_AFTER:
+                return False
+            self._last_attempt = now
+        threading.Thread(target=self._refresh_quietly, name=f"snapshot-{self.name}", daemon=True).start()
+        return True
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("Error sincronizando la copia local '%s': %s", self.name, e)
+
+    def _create_table(self, conn: sqlite3.Connection, name: str, description) -> None:
+        cols: List[str] = []
+        for c in description:
+            # Los textos se comparan como en SQL Server (los números ignoran la intercalación)
+            decl = _decl_type(c[1]) or "COLLATE NAV"
+            cols.append(f"[{c[0]}] {decl}")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(cols)}, PRIMARY KEY ([{self.key_column}]))")
+
+SNAPSHOTS: Dict[str, TableSnapshot] = {
+    "obras_ayu": TableSnapshot(
+        "obras_ayu", table="obras ayu", key_column="No_", modified_column="Last Date Modified"
+    ),
+}
+
+def set_snapshot_dir(path: str) -> None:
+    """Apunta todas las copias a otro directorio (p. ej. en benchmarks contra la BD sintética)."""
+    for snap in SNAPSHOTS.values():
+        snap.path = os.path.join(path, f"{snap.name}.sqlite")
+        snap._local = threading.local()
+        snap._meta_cache = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza las copias locales de tablas maestras de Navision")
+    parser.add_argument("--full", action="store_true", help="Recarga completa (recoge borrados)")
+    parser.add_argument("--snapshot", choices=sorted(SNAPSHOTS), default=None, help="Solo esta copia")
+    args = parser.parse_args()
+
+    names = [args.snapshot] if args.snapshot else list(SNAPSHOTS)
+    for name in names:
+        stats = SNAPSHOTS[name].refresh(full=True if args.full else None)
+        print(f"✅ {name}: {stats['fetched']} filas traídas, {stats['rows']} en local "
+              f"(marca de agua {stats['watermark']}, {stats['seconds']} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+SELECT
+    v.venta_firme,
+    c.coste_total,
+    v.venta_firme - c.coste_total AS margen
+FROM (
+    SELECT SUM(dp.[Importe]) AS venta_firme
+    FROM [detalles produccion] dp
+    WHERE dp.[Nº Proyecto] = ? AND dp.[Tipo] = 0
+) v
+LEFT JOIN (
+    SELECT [COSTETOTAL] AS coste_total
+    FROM COSTETOTALOBRAS
+    WHERE [obra] = ?
+) c ON 1 = 1
\ No newline at end of file
@@ -0,0 +1,270 @@
+# database/sql/movproyecto_mirror.py
+"""
+Réplica local de movproyecto en un dataset Parquet particionado por [Job No_]
+(directorios Hive "Job No_=<obra>"), para que los scripts de análisis por obra
+lean de disco con filtros empujados al lector en lugar de recorrer la tabla
+por red en cada ejecución.
+
+La sincronización solo añade los movimientos nuevos: la marca de agua es
+[Entry No_], el contador de movimientos de Navision, que solo crece. [Posting
+Date] no sirve como marca porque se registran movimientos con fecha contable
+atrasada. Si la vista expone otra columna entera creciente (p. ej. el rowversion
+[timestamp] convertido a BIGINT) se puede usar con MOVPROYECTO_MIRROR_WATERMARK.
+
+Uso (desde la raíz del proyecto, p. ej. en un cron):
+    python -m database.sql.movproyecto_mirror            # añade lo nuevo
+    python -m database.sql.movproyecto_mirror --full     # reconstruye la réplica
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from database.sql.navision_connector import borrow_connection
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+MIRROR_DIR = os.environ.get(
+    "MOVPROYECTO_MIRROR_DIR", str(PROJECT_ROOT / "data" / "mirror" / "movproyecto")
+)
+MIRROR_TABLE = os.environ.get("MOVPROYECTO_MIRROR_TABLE", "movproyecto")
+WATERMARK_COLUMN = os.environ.get("MOVPROYECTO_MIRROR_WATERMARK", "Entry No_")
+PARTITION_COLUMN = "Job No_"
+MIRROR_ARRAYSIZE = 5000
+# Filas que se acumulan antes de escribir (menos ficheros pequeños por partición)
+MIRROR_WRITE_ROWS = int(os.environ.get("MOVPROYECTO_MIRROR_WRITE_ROWS", "500000"))
+STATE_FILE = "_state.json"
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise RuntimeError("La réplica Parquet necesita pyarrow (pip install pyarrow)") from e
+    return pa, ds
+
+# Tipos Python (los de pyodbc) -> nombre de tipo Arrow que se guarda en el estado
+_ARROW_TYPES = {
+    str: "string", int: "int64", float: "double",
+    bool: "bool", dt.datetime: "timestamp[us]", dt.date: "date32",
+}
+# Los importes de Navision son decimal(38,20); se usa si el driver no da precisión y escala
+DEFAULT_DECIMAL = (38, 20)
+
+def _decimal_name(precision: int, scale: int) -> str:
+    return f"decimal128({precision},{scale})"
+
+def _arrow_type(name: str):
+    pa, _ = _pyarrow()
+    if name.startswith("decimal128("):
+        precision, scale = name[len("decimal128("):-1].split(",")
+        return pa.decimal128(int(precision), int(scale))
+    return {
+        "string": pa.string(), "int64": pa.int64(), "double": pa.float64(),
+        "bool": pa.bool_(), "timestamp[us]": pa.timestamp("us"), "date32": pa.date32(),
+    }[name]
+
+def _described_type(col) -> Optional[str]:
+    # Tipo según cursor.description; None si el driver no lo informa (p. ej. sqlite3)
+    py_type = col[1] if isinstance(col[1], type) else None
+    if py_type is Decimal:
+        precision, scale = col[4], col[5]
+        if precision and scale is not None and precision <= 38:
+            return _decimal_name(precision, scale)
+        return _decimal_name(*DEFAULT_DECIMAL)
+    return _ARROW_TYPES.get(py_type)
+
+def _schema_types(description, rows: Sequence[Sequence[Any]]) -> Dict[str, str]:
+    """
+    Esquema de la réplica a partir de cursor.description (pyodbc informa tipo,
+    precisión y escala). Solo si el driver no da el tipo se mira el primer
+    valor no nulo de todas las filas de la primera escritura.
+    """
+    types = {}
+    for i, col in enumerate(description):
+        name = _described_type(col)
+        if name is None:
+            sample = next((r[i] for r in rows if r[i] is not None), None)
+            if isinstance(sample, Decimal):
+                name = _decimal_name(*DEFAULT_DECIMAL)
+            else:
+                name = _ARROW_TYPES.get(type(sample), "string")
+        types[col[0]] = name
+    return types
+
+def _to_table(cols: List[str], types: Dict[str, str], rows: List[Sequence[Any]]):
+    pa, _ = _pyarrow()
+    arrays = []
+    for name, values in zip(cols, zip(*rows)):
+        if types[name].startswith("decimal128("):
+            # Decimal exacto, como lo devuelve Navision (nada de pasar por float)
+            values = [v if v is None or isinstance(v, Decimal) else Decimal(str(v)) for v in values]
+        elif types[name] == "double":
+            values = [None if v is None else float(v) for v in values]
+        elif types[name] == "string":
+            values = [None if v is None else str(v).strip() for v in values]
+        arrays.append(pa.array(values, type=_arrow_type(types[name])))
+    return pa.Table.from_arrays(arrays, names=cols)
+
+def _partitioning():
+    pa, ds = _pyarrow()
+    # Esquema explícito: si no, "855" se inferiría como entero al leer
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+
+def read_state(base_dir: str = None) -> Optional[Dict[str, Any]]:
+    path = Path(base_dir or MIRROR_DIR) / STATE_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _write_state(base_dir: Path, state: Dict[str, Any]) -> None:
+    tmp = base_dir / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, base_dir / STATE_FILE)
+
+def _drop_uncommitted(base_dir: Path, watermark: int) -> int:
+    """
+    Borra ficheros de una sincronización que no llegó a guardar su marca de agua
+    (su nombre empieza por la marca desde la que se leyó), para no duplicar filas.
+    """
+    removed = 0
+    for f in base_dir.glob("*/part-*.parquet"):
+        try:
+            start = int(f.name.split("-")[1])
+        except (IndexError, ValueError):
+            continue
+        if start > watermark:
+            f.unlink()
+            removed += 1
+    return removed
+
+def sync(full: bool = False) -> Dict[str, Any]:
+    """
+    Añade a la réplica los movimientos con marca de agua mayor que la última
+    sincronizada. Con full=True (o si no hay réplica) la reconstruye en un
+    directorio aparte y la sustituye al terminar.
+    """
+    _, ds = _pyarrow()
+    base_dir = Path(MIRROR_DIR)
+    state = None if full else read_state(str(base_dir))
+    full = state is None
+    target = base_dir.with_name(base_dir.name + ".staging") if full else base_dir
+    if full:
+        shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True, exist_ok=True)
+
+    after = state["watermark"] if state else -1
+    if state:
+        _drop_uncommitted(target, after)
+    sql = f"SELECT * FROM {MIRROR_TABLE} WHERE [{WATERMARK_COLUMN}] > ? ORDER BY [{WATERMARK_COLUMN}]"
+
+    t0 = time.perf_counter()
+    n, chunk, watermark, max_posting = 0, 0, after, state.get("max_posting_date") if state else None
+    types = state["types"] if state else None
+    pending: List[Sequence[Any]] = []
+
+    def flush():
+        nonlocal chunk, pending, types
+        if not pending:
+            return
+        if types is None:
+            types = _schema_types(description, pending)
+        table = _to_table(cols, types, pending)
+        ds.write_dataset(
+            table, str(target), format="parquet", partitioning=_partitioning(),
+            basename_template=f"part-{after + 1}-{chunk}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        chunk += 1
+        pending = []
+
+    with borrow_connection() as remote:
+        cur = remote.cursor()
+        try:
+            cur.execute(sql, (after,))
+            description = cur.description
+            cols = [c[0] for c in description]
+            wm_idx = cols.index(WATERMARK_COLUMN)
+            date_idx = cols.index("Posting Date") if "Posting Date" in cols else None
+            while True:
+                batch = cur.fetchmany(MIRROR_ARRAYSIZE)
+                if not batch:
+                    break
+                pending.extend(batch)
+                n += len(batch)
+                watermark = max(watermark, batch[-1][wm_idx])
+                if date_idx is not None:
+                    dates = [str(r[date_idx]) for r in batch if r[date_idx] is not None]
+                    if max_posting:
+                        dates.append(max_posting)
+                    max_posting = max(dates, default=None)
+                if len(pending) >= MIRROR_WRITE_ROWS:
+                    flush()
+        finally:
+            cur.close()
+    flush()
+
+    new_state = {
+        "table": MIRROR_TABLE,
+        "watermark_column": WATERMARK_COLUMN,
+        "watermark": watermark,
+        "max_posting_date": max_posting,
+        "rows": (state["rows"] if state else 0) + n,
+        "types": types,
+        "synced_at": time.time(),
+        "full_at": time.time() if full else state["full_at"],
+    }
+    _write_state(target, new_state)
+    if full:
+        old = base_dir.with_name(base_dir.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if base_dir.exists():
+            base_dir.rename(old)
+        target.rename(base_dir)
+        shutil.rmtree(old, ignore_errors=True)
+    return {
+        "full": full, "fetched": n, "rows": new_state["rows"], "watermark": watermark,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+def dataset(base_dir: str = None):
+    """pyarrow.dataset.Dataset sobre la réplica (lanza RuntimeError si no existe)."""
+    _, ds = _pyarrow()
+    base_dir = base_dir or MIRROR_DIR
+    state = read_state(base_dir)
+    if state is None:
+        raise RuntimeError(
+            f"No hay réplica de movproyecto en {base_dir}; "
+            "ejecuta: python -m database.sql.movproyecto_mirror"
+        )
+    # Los ficheros que empiezan por "_" o "." (el estado) se ignoran
+    return ds.dataset(base_dir, format="parquet", partitioning=_partitioning())
+
+def read_job(job_no: str, columns: Optional[List[str]] = None, filter=None, base_dir: str = None):
+    """
+    Movimientos de una obra como pyarrow.Table. Solo se abren los ficheros de
+    su partición; filter (expresión de pyarrow.dataset, p. ej.
+    ds.field("empresa") == 1) se aplica también en el lector.
+    """
+    _, ds = _pyarrow()
+    expr = ds.field(PARTITION_COLUMN) == str(job_no).strip()
+    if filter is not None:
+        expr = expr & filter
+    return dataset(base_dir).to_table(columns=columns, filter=expr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza la réplica Parquet local de movproyecto")
+    parser.add_argument("--full", action="store_true", help="Reconstruye la réplica desde cero")
+    args = parser.parse_args()
+
+    stats = sync(full=args.full)
+    print(f"✅ movproyecto: {stats['fetched']} movimientos nuevos, {stats['rows']} en la réplica "
+          f"(marca de agua {stats['watermark']}, {stats['seconds']} s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 import pyodbc
 
@@ -13,6 +17,10 @@ def _env(k: str) -> str:
         raise RuntimeError(f"Falta variable de entorno: {k}")
     return v
 
+def _env_float(k: str, default: float) -> float:
+    v = os.environ.get(k)
+    return float(v) if v else default
+
 def get_connection() -> pyodbc.Connection:
     """
     Conexión a SQL Server (FreeTDS / ODBC).
@@ -35,3 +43,238 @@ def get_connection() -> pyodbc.Connection:
         "ClientCharset=UTF-8;"
     )
     return pyodbc.connect(conn_str, timeout=10)
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexiones DB-API.
+
+    - min_size: conexiones que se mantienen abiertas aunque estén ociosas.
+    - max_size: máximo de conexiones abiertas (prestadas + libres).
+    - max_idle: segundos que una conexión libre puede estar sin usarse antes de cerrarla.
+    - validate_after: si una conexión lleva más de estos segundos libre, se comprueba
+      con un SELECT 1 antes de prestarla (0 = validar siempre).
+    - acquire_timeout: segundos máximos esperando una conexión libre.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any] = get_connection,
+        min_size: int = 1,
+        max_size: int = 8,
+        max_idle: float = 300.0,
+        validate_after: float = 5.0,
+        acquire_timeout: float = 30.0,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Tamaños de pool inválidos: min={min_size}, max={max_size}")
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.validate_after = validate_after
+        self.acquire_timeout = acquire_timeout
+
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[Any, float]] = []  # pila LIFO de (conexión, último uso)
+        self._size = 0                            # conexiones abiertas (prestadas + libres)
+        self._closed = False
+        self._stats = {"created": 0, "reused": 0, "evicted": 0, "invalidated": 0, "timeouts": 0}
+
+    # --- API pública ---
+    def prefill(self) -> None:
+        """Abre conexiones hasta llegar a min_size."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._create()
+            self.release(conn)
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Presta una conexión viva. Lanza TimeoutError si el pool está agotado."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, last_used = None, 0.0
+            expired: List[Any] = []
+            try:
+                with self._cond:
+                    expired = self._pop_expired_locked()
+                    while True:
+                        if self._closed:
+                            raise RuntimeError("El pool de conexiones está cerrado")
+                        if self._idle:
+                            conn, last_used = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise TimeoutError(
+                                f"No hay conexiones libres en el pool (max_size={self.max_size})"
+                            )
+                        self._cond.wait(remaining)
+            finally:
+                self._close_all(expired)
+
+            if conn is None:
+                return self._create()
+            if time.monotonic() - last_used <= self.validate_after or self._is_alive(conn):
+                with self._cond:
+                    self._stats["reused"] += 1
+                return conn
+            # Conexión muerta: se descarta y se intenta con otra
+            with self._cond:
+                self._stats["invalidated"] += 1
+            self._discard(conn)
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """Devuelve una conexión al pool (o la cierra si está rota o el pool está cerrado)."""
+        if not discard and not self._closed:
+            try:
+                # Deja la conexión sin transacción abierta para el siguiente usuario
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        self._close_all([c for c, _ in idle])
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+            }
+
+    # --- internos ---
+    def _create(self) -> Any:
+        try:
+            conn = self.factory()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn: Any) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close_all([conn])
+
+    def _pop_expired_locked(self) -> List[Any]:
+        # Las más antiguas están al fondo de la pila; se conservan al menos min_size
+        now = time.monotonic()
+        expired = []
+        while (
+            self._idle
+            and self._size > self.min_size
+            and now - self._idle[0][1] > self.max_idle
+        ):
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self._stats["evicted"] += 1
+            expired.append(conn)
+        return expired
+
+    @staticmethod
+    def _is_alive(conn: Any) -> bool:
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchall()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_all(conns: List[Any]) -> None:
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Pool por defecto contra Navision, configurable por variables de entorno."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool(
+                get_connection,
+                min_size=int(_env_float("NAVISION_POOL_MIN_SIZE", 1)),
+                max_size=int(_env_float("NAVISION_POOL_MAX_SIZE", 8)),
+                max_idle=_env_float("NAVISION_POOL_MAX_IDLE", 300.0),
+                validate_after=_env_float("NAVISION_POOL_VALIDATE_AFTER", 5.0),
+                acquire_timeout=_env_float("NAVISION_POOL_ACQUIRE_TIMEOUT", 30.0),
+            )
+            _POOL.prefill()
+        return _POOL
+
+def configure_pool(factory: Callable[[], Any] = get_connection, **kwargs) -> ConnectionPool:
+    """Sustituye el pool por defecto (p. ej. para apuntar a una BD local en benchmarks)."""
+    global _POOL
+    pool = ConnectionPool(factory, **kwargs)
+    with _POOL_LOCK:
+        old, _POOL = _POOL, pool
+    if old is not None:
+        old.close()
+    pool.prefill()
+    return pool
+
+@contextmanager
+def borrow_connection(pooled: bool = True, timeout: Optional[float] = None) -> Iterator[Any]:
+    """
+    Conexión para una petición: prestada del pool o, con pooled=False,
+    una conexión nueva que se cierra al salir. timeout limita la espera
+    por una conexión libre del pool.
+    """
+    if pooled:
+        with get_pool().connection(timeout) as conn:
+            yield conn
+        return
+    # Sin crear ni rellenar el pool: solo se reutiliza su factory si ya está configurado
+    with _POOL_LOCK:
+        factory = _POOL.factory if _POOL is not None else get_connection
+    conn = factory()
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,97 @@
+# database/sql/pagination.py
+"""
+Paginación por clave (keyset / seek): en lugar de OFFSET, cada página pide
+las filas con page_key mayor que la última devuelta, y el continuation token
+lleva ese último valor.
+"""
+import base64
+import datetime as dt
+import hashlib
+import json
+import re
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+# Límite de filas en el servidor (T-SQL, SQL Server 2012+); el ? va el último
+_FETCH_NEXT = "\nOFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+
+def has_order_by(sql: str) -> bool:
+    return bool(_ORDER_BY.search(sql))
+
+def check_pageable(sql: str) -> None:
+    """La query se envuelve en una subconsulta, así que no puede llevar su propio ORDER BY."""
+    if has_order_by(sql):
+        raise ValueError("Una query con page_key o max_rows no puede tener ORDER BY (lo añade la paginación)")
+
+def keyset_sql(sql: str, page_key: str, after: bool, limited: bool = False) -> str:
+    """
+    Envuelve la query para ordenar por page_key y, si hay token, seguir tras el
+    último valor. Con limited, el servidor devuelve como mucho tantas filas como
+    indique un último parámetro (página + 1, para saber si hay más).
+    """
+    where = f"\nWHERE q.[{page_key}] > ?" if after else ""
+    fetch = _FETCH_NEXT if limited else ""
+    return f"SELECT q.* FROM (\n{sql}\n) AS q{where}\nORDER BY q.[{page_key}]{fetch}"
+
+def limit_sql(sql: str) -> str:
+    """
+    Limita en el servidor una query sin page_key al número de filas del último
+    parámetro. FETCH exige un ORDER BY: (SELECT NULL) no impone ningún orden.
+    """
+    if has_order_by(sql):
+        raise ValueError("limit_sql no admite queries con ORDER BY")
+    return f"SELECT q.* FROM (\n{sql}\n) AS q\nORDER BY (SELECT NULL){_FETCH_NEXT}"
+
+def sqlite_sql(sql: str) -> str:
+    """Traduce el límite de keyset_sql/limit_sql a SQLite (copias locales y BD de pruebas)."""
+    return sql.replace(_FETCH_NEXT, "\nLIMIT ?")
+
+def params_fingerprint(query_key: str, params: Tuple[Any, ...]) -> str:
+    raw = json.dumps([query_key, [str(p) for p in params]], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def _encode_value(v: Any) -> list:
+    # Se guarda el tipo para que el valor vuelva al servidor igual que salió
+    if isinstance(v, bool):
+        return ["bool", v]
+    if isinstance(v, int):
+        return ["int", v]
+    if isinstance(v, float):
+        return ["float", v]
+    if isinstance(v, Decimal):
+        return ["decimal", str(v)]
+    if isinstance(v, dt.datetime):
+        return ["datetime", v.isoformat()]
+    if isinstance(v, dt.date):
+        return ["date", v.isoformat()]
+    return ["str", str(v)]
+
+def _decode_value(kind: str, v: Any) -> Any:
+    if kind == "decimal":
+        return Decimal(v)
+    if kind == "datetime":
+        return dt.datetime.fromisoformat(v)
+    if kind == "date":
+        return dt.date.fromisoformat(v)
+    return v
+
+def encode_token(query_key: str, params: Tuple[Any, ...], last_key: Any) -> str:
+    payload = {"q": query_key, "p": params_fingerprint(query_key, params), "k": _encode_value(last_key)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_token(token: Optional[str], query_key: str, params: Tuple[Any, ...]) -> Optional[Any]:
+    """Último valor de page_key del token; valida que sea de la misma query y parámetros."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        kind, value = payload["k"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("page_token inválido") from e
+    if payload.get("q") != query_key or payload.get("p") != params_fingerprint(query_key, params):
+        raise ValueError("page_token no corresponde a esta query o a estos parámetros")
+    return _decode_value(kind, value)
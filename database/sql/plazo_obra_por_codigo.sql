@@ -0,0 +1,9 @@
+SELECT
+    o.[Plazo inicial_AYU]            AS plazo_inicial,
+    o.[Fecha adjudicación]           AS adjudicacion,
+    o.[Fecha firma contrato]         AS firma_contrato,
+    o.[Fecha acta de replanteo]      AS replanteo,
+    o.[Fecha Fin Vigente]            AS fin_contrato,
+    o.[Fecha acta recep_ definitiva] AS recepcion
+FROM [obras ayu] o
+WHERE o.[No_] = ?
\ No newline at end of file
@@ -0,0 +1,4 @@
+SELECT o.[Presupuesto Vigente+IVA] AS presupuesto
+FROM [obras ayu] o
+WHERE o.[No_] = ?
+  AND o.[Job Posting Group] IN ('1:EDIF RES', '2:EDIF NOR', '4:O CIVIL')
\ No newline at end of file
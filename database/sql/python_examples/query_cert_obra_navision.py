@@ -1,4 +1,5 @@
 import os
+import sys
 import argparse
 from dotenv import load_dotenv
 import pyodbc
@@ -51,21 +52,39 @@ def get_certificacion_parcial(job_id: str):
             result = cur.fetchone()
             return result[0]
 
+def get_certificacion_parcial_mirror(job_id: str):
+    """La misma suma desde la réplica Parquet local (solo se lee la partición de la obra)."""
+    sys.path.insert(0, os.path.dirname(project_root))
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    from database.sql.movproyecto_mirror import read_job
+
+    table = read_job(job_id, columns=["Total Price (LCY)"], filter=ds.field("empresa") == 1)
+    return pc.sum(table["Total Price (LCY)"]).as_py()
+
 def main():
     parser = argparse.ArgumentParser(
         description='Consultar certificación parcial total para un Job No. desde Navision'
     )
     parser.add_argument('--id', type=str, default='880', help='ID de obra (por defecto: 880)')
+    parser.add_argument('--mirror', action='store_true',
+                        help='Leer de la réplica Parquet local de movproyecto en vez de Navision')
     
     args = parser.parse_args()
     
     print(f"🔍 CONSULTA DE CERTIFICACIÓN PARCIAL PARA OBRA ID: {args.id}")
     print("=" * 70)
-    print("📊 Base de datos: Navision (SQL Server)")
+    if args.mirror:
+        print("📊 Origen: réplica Parquet local (python -m database.sql.movproyecto_mirror)")
+    else:
+        print("📊 Base de datos: Navision (SQL Server)")
     print("📋 Tabla: movproyecto")
     
     try:
-        certificacion = get_certificacion_parcial(args.id)
+        if args.mirror:
+            certificacion = get_certificacion_parcial_mirror(args.id)
+        else:
+            certificacion = get_certificacion_parcial(args.id)
         
         print(f"\n📊 Resultado:")
         print(f"   🏗️ ID de obra: {args.id}")
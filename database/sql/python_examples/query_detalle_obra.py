@@ -1,4 +1,6 @@
 import os
+import sys
+import argparse
 import pandas as pd
 from pathlib import Path
 from query_margenes_navision import get_connection
@@ -24,21 +26,57 @@ FROM ayu.dbo.movproyecto m
 WHERE CAST(m.[Job No_] AS VARCHAR(50)) = ? AND empresa = 1
 """
 
+# Mismas columnas y alias, leídas de la réplica Parquet local (--mirror)
+MIRROR_COLUMNS = {
+    "Total Price (LCY)": "venta",
+    "Total Cost Prev": "coste",
+    "Total Cost (LCY)": "gasto",
+    "Actividad": "Actividad",
+    "Posting Date": "fecha",
+    "Vendor No_": "codigoproveedor",
+    "Document No_": "documento",
+}
+
 # === CARPETA DE SALIDA ===
 OUTDIR = Path("data/detalle_obra")
 OUTDIR.mkdir(exist_ok=True)
 
+def read_detalle_mirror(job: str) -> pd.DataFrame:
+    """Detalle de una obra desde la réplica local (solo se lee su partición)."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+    import pyarrow.dataset as ds
+    from database.sql.movproyecto_mirror import read_job
+
+    table = read_job(job, columns=list(MIRROR_COLUMNS), filter=ds.field("empresa") == 1)
+    return table.to_pandas().rename(columns=MIRROR_COLUMNS)
+
+def _save(job: str, df: pd.DataFrame) -> None:
+    # Persistir en disco
+    outfile = OUTDIR / f"detalle_obra_{job}.csv"
+    df.to_csv(outfile, index=False, encoding="utf-8-sig")
+    print(f"   ✅ Guardado en {outfile} ({len(df)} filas)")
+
 def main():
+    parser = argparse.ArgumentParser(description="Exporta el detalle de movimientos por obra")
+    parser.add_argument("--mirror", action="store_true",
+                        help="Leer de la réplica Parquet local de movproyecto en vez de Navision")
+    args = parser.parse_args()
+
+    if args.mirror:
+        for job in JOB_IDS:
+            try:
+                print(f"▶ Procesando obra {job} (réplica local)...")
+                _save(job, read_detalle_mirror(job))
+            except Exception as e:
+                print(f"   ❌ Error procesando obra {job}: {str(e)}")
+        return
+
     with get_connection() as conn:
         for job in JOB_IDS:
             try:
                 print(f"▶ Procesando obra {job}...")
                 df = pd.read_sql(QUERY, conn, params=[job])
-
-                # Persistir en disco
-                outfile = OUTDIR / f"detalle_obra_{job}.csv"
-                df.to_csv(outfile, index=False, encoding="utf-8-sig")
-                print(f"   ✅ Guardado en {outfile} ({len(df)} filas)")
+                _save(job, df)
                 
             except Exception as e:
                 print(f"   ❌ Error procesando obra {job}: {str(e)}")
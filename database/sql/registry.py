@@ -1,21 +1,271 @@
+import os
+import re
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, List
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from database.sql.pagination import check_pageable
+
+# Las rutas de sql_path son relativas a la raíz del proyecto, no al CWD
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Cada cuántos segundos se mira el mtime de un .sql ya cargado
+SQL_RELOAD_CHECK_INTERVAL = float(os.environ.get("SQL_RELOAD_CHECK_INTERVAL", "2"))
+
+# TTL por defecto de la caché de resultados (segundos)
+DEFAULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+
+# Plazo por defecto de cada query en segundos (0 = sin plazo)
+DEFAULT_QUERY_TIMEOUT = float(os.environ.get("NAVISION_QUERY_TIMEOUT", "30")) or None
 
 @dataclass(frozen=True)
 class QuerySpec:
     sql_path: str
     required_params: List[str]
     param_order: List[str]
+    cache_ttl: float = DEFAULT_CACHE_TTL  # 0 = no cachear resultados
+    # Columna del único predicado "<col> = ?"; si se declara, execute_many
+    # agrupa varias obras en un IN (...) por round trip
+    batch_column: Optional[str] = None
+    # Plazo total (conexión + ejecución + lectura); al vencer se cancela en el servidor
+    timeout_s: Optional[float] = DEFAULT_QUERY_TIMEOUT
+    # Filas máximas por respuesta (None = sin límite) y, si se declara, columna
+    # única y ordenable del resultado para paginar por clave con page_token
+    max_rows: Optional[int] = None
+    page_key: Optional[str] = None
+    # Nombre de una copia local (local_snapshot.SNAPSHOTS) desde la que se puede
+    # servir la query mientras esté al día; el SQL debe valer también en SQLite
+    local_snapshot: Optional[str] = None
+    # Descripción de la tool que se genera para el LLM (tools/queries.py) y
+    # preguntas de ejemplo con las que se evalúa el enrutado (tools/tool_index.py)
+    description: str = ""
+    examples: Tuple[str, ...] = ()
 
 REGISTRY: Dict[str, QuerySpec] = {
     "contactos_obra_por_codigo": QuerySpec(
         sql_path="database/sql/contactos_obra_por_codigo.sql",
         required_params=["obra_code"],
         param_order=["obra_code"],
+        batch_column="[Nº proyecto]",
+        description="Devuelve contactos (cargo_id, nombre, movil) para una obra.",
+        examples=(
+            "Dame cargo, nombre y móvil de la obra 855",
+            "teléfono del encargado de la 855",
+            "¿quién es el jefe de obra de la 812?",
+        ),
     ),
     "cronograma_hitos_por_codigo": QuerySpec(
         sql_path="database/sql/cronograma_hitos_por_codigo.sql",
         required_params=["obra_code"],
         param_order=["obra_code"],
+        batch_column="o.No_",
+        local_snapshot="obras_ayu",
+        description=(
+            "Devuelve fechas clave de la obra (recepción, adjudicación, firma contrato, "
+            "replanteo, fin contrato)."
+        ),
+        examples=(
+            "Fechas clave (recepción, adjudicación, firma, replanteo, fin) de la obra 855",
+            "¿cuándo se firmó el contrato de la obra 812?",
+            "hitos de la obra 880",
+        ),
+    ),
+    "kpir_por_codigo": QuerySpec(
+        sql_path="database/sql/kpir_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code"],
+        batch_column="v.[obra]",
+        description=(
+            "Devuelve la desviación económica K-PIR (kpir) de la obra: diferencia entre "
+            "costes reales y presupuestados."
+        ),
+        examples=("¿cuál es el K-PIR de la obra 855?", "desviación económica de la 880"),
+    ),
+    "precio_obra_por_codigo": QuerySpec(
+        sql_path="database/sql/precio_obra_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code"],
+        batch_column="o.[No_]",
+        local_snapshot="obras_ayu",
+        description=(
+            "Devuelve el precio de la obra: presupuesto vigente con IVA, incluidas las "
+            "desviaciones (solo edificación residencial, no residencial y obra civil)."
+        ),
+        examples=("precio de la obra 855", "presupuesto vigente con IVA de la 880"),
+    ),
+    "margen_obra_por_codigo": QuerySpec(
+        sql_path="database/sql/margen_obra_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code", "obra_code"],
+        description=(
+            "Devuelve el margen de la obra: ingresos certificados (venta_firme), coste "
+            "total y margen (venta_firme - coste_total)."
+        ),
+        examples=("margen de la obra 855", "¿qué beneficio deja la obra 880?"),
+    ),
+    "certificacion_obra_por_codigo": QuerySpec(
+        sql_path="database/sql/certificacion_obra_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code"],
+        description=(
+            "Devuelve la certificación parcial acumulada de la obra (suma de movimientos "
+            "de proyecto), el número de movimientos y la fecha del último."
+        ),
+        examples=("certificación de la obra 880", "¿cuánto llevamos certificado en la 855?"),
+    ),
+    "curva_s_por_codigo": QuerySpec(
+        sql_path="database/sql/curva_s_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code"],
+        max_rows=500,
+        page_key="t",
+        description=(
+            "Devuelve la curva S de producción de la obra: importe producido (y) por "
+            "fecha (t), ordenado por fecha."
+        ),
+        examples=("curva S de la obra 855", "evolución de la producción de la 880"),
+    ),
+    "plazo_obra_por_codigo": QuerySpec(
+        sql_path="database/sql/plazo_obra_por_codigo.sql",
+        required_params=["obra_code"],
+        param_order=["obra_code"],
+        batch_column="o.[No_]",
+        local_snapshot="obras_ayu",
+        description=(
+            "Devuelve el plazo de la obra: plazo inicial en días y las fechas de inicio "
+            "(adjudicación, firma, replanteo) y fin (fin vigente, recepción) para calcular "
+            "la duración."
+        ),
+        examples=("plazo de la obra 855", "¿cuántos días dura la obra 880?"),
     ),
 }
+
+def resolve_sql_path(sql_path: str) -> Path:
+    p = Path(sql_path)
+    return p if p.is_absolute() else PROJECT_ROOT / p
+
+def count_placeholders(sql: str) -> int:
+    """
+    Cuenta los "?" posicionales ignorando literales ('...'), identificadores
+    ([...] y "...") y comentarios (-- y /* */).
+    """
+    n, i, size = 0, 0, len(sql)
+    closers = {"'": "'", '"': '"', "[": "]"}
+    while i < size:
+        ch = sql[i]
+        if ch in closers:
+            end = sql.find(closers[ch], i + 1)
+            # '' dentro de un literal es una comilla escapada
+            while ch == "'" and end != -1 and sql[end + 1:end + 2] == "'":
+                end = sql.find("'", end + 2)
+            i = size if end == -1 else end + 1
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = size if end == -1 else end + 1
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = size if end == -1 else end + 2
+        else:
+            if ch == "?":
+                n += 1
+            i += 1
+    return n
+
+# Alias con el que la versión por lotes devuelve el valor del parámetro en cada fila
+BATCH_KEY_ALIAS = "_batch_key"
+
+@lru_cache(maxsize=256)
+def build_batch_sql(sql: str, batch_column: str, n: int) -> str:
+    """
+    Reescribe "<batch_column> = ?" como "<batch_column> IN (?, ..., ?)" y añade
+    la columna al SELECT como _batch_key para poder repartir las filas.
+    """
+    predicate = re.compile(rf"{re.escape(batch_column)}\s*=\s*\?")
+    matches = predicate.findall(sql)
+    if len(matches) != 1:
+        raise ValueError(
+            f"Se esperaba exactamente un predicado '{batch_column} = ?' y hay {len(matches)}"
+        )
+    select = re.compile(r"^\s*SELECT\s+(?!DISTINCT\b|TOP\b)", re.IGNORECASE)
+    if not select.match(sql):
+        raise ValueError("La versión por lotes solo admite SELECT simples (sin DISTINCT/TOP)")
+    in_list = f"{batch_column} IN ({', '.join('?' * n)})"
+    sql = predicate.sub(lambda _: in_list, sql, count=1)
+    return select.sub(lambda m: f"{m.group(0)}{batch_column} AS {BATCH_KEY_ALIAS}, ", sql, count=1)
+
+def _load_statement(query_key: str, spec: QuerySpec) -> Tuple[int, str]:
+    path = resolve_sql_path(spec.sql_path)
+    try:
+        mtime = path.stat().st_mtime_ns
+        sql = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise ValueError(f"No se puede leer el SQL de '{query_key}' ({path}): {e}") from e
+    n = count_placeholders(sql)
+    if n != len(spec.param_order):
+        raise ValueError(
+            f"'{query_key}': {path.name} tiene {n} placeholders '?' "
+            f"pero param_order declara {len(spec.param_order)} {spec.param_order}"
+        )
+    if spec.batch_column is not None:
+        if len(spec.param_order) != 1:
+            raise ValueError(f"'{query_key}': batch_column solo admite queries de un parámetro")
+        try:
+            build_batch_sql(sql, spec.batch_column, 1)
+        except ValueError as e:
+            raise ValueError(f"'{query_key}': {e}") from e
+    if spec.page_key is not None or spec.max_rows is not None:
+        try:
+            check_pageable(sql)
+        except ValueError as e:
+            raise ValueError(f"'{query_key}': {e}") from e
+    return mtime, sql
+
+class _StatementCache:
+    """SQL del REGISTRY en memoria; un .sql solo se relee si cambia su mtime."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # query_key -> (mtime_ns, sql, último chequeo de mtime)
+        self._entries: Dict[str, Tuple[int, str, float]] = {}
+
+    def preload(self, registry: Dict[str, QuerySpec]) -> None:
+        errors = []
+        for qk, spec in registry.items():
+            try:
+                mtime, sql = _load_statement(qk, spec)
+            except ValueError as e:
+                errors.append(str(e))
+                continue
+            self._entries[qk] = (mtime, sql, time.monotonic())
+        if errors:
+            raise ValueError("REGISTRY inválido:\n  " + "\n  ".join(errors))
+
+    def get(self, query_key: str) -> str:
+        now = time.monotonic()
+        entry = self._entries.get(query_key)
+        if entry is not None and now - entry[2] < SQL_RELOAD_CHECK_INTERVAL:
+            return entry[1]
+
+        spec = REGISTRY[query_key]
+        with self._lock:
+            entry = self._entries.get(query_key)
+            try:
+                mtime = resolve_sql_path(spec.sql_path).stat().st_mtime_ns
+            except OSError:
+                mtime = None
+            if entry is not None and entry[0] == mtime:
+                self._entries[query_key] = (entry[0], entry[1], now)
+                return entry[1]
+            mtime, sql = _load_statement(query_key, spec)
+            self._entries[query_key] = (mtime, sql, now)
+            return sql
+
+_STATEMENTS = _StatementCache()
+_STATEMENTS.preload(REGISTRY)
+
+def get_sql(query_key: str) -> str:
+    """SQL validado de una query del REGISTRY."""
+    return _STATEMENTS.get(query_key)
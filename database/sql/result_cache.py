@@ -0,0 +1,88 @@
+# database/sql/result_cache.py
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+def _estimate_size(obj: Any) -> int:
+    """Tamaño aproximado en bytes de un resultado (dicts/listas de escalares)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_estimate_size(v) for v in obj)
+    return size
+
+def normalize_param(value: Any) -> Any:
+    # "855 " y "855" son la misma obra para SQL Server
+    return value.strip() if isinstance(value, str) else value
+
+class ResultCache:
+    """
+    Caché LRU con TTL por entrada, acotada por número de entradas y por bytes.
+    Thread-safe; expone contadores de hits/misses/evictions para dimensionarla.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (expira_en, bytes, valor); el orden es el de uso (LRU al principio)
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove_locked(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        size = _estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self._remove_locked(key)
+            if size > self.max_bytes:
+                # Un único resultado más grande que toda la caché no se guarda
+                self._stats["rejected"] += 1
+                return
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove_locked(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, query_key: Optional[str] = None) -> None:
+        """Vacía la caché entera o solo las entradas de una query_key."""
+        with self._lock:
+            keys = [k for k in self._data if query_key is None or k[0] == query_key]
+            for k in keys:
+                self._remove_locked(k)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._data), "bytes": self._bytes}
+
+    def _remove_locked(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
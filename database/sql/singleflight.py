@@ -0,0 +1,126 @@
+# database/sql/singleflight.py
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from database.sql.deadline import Deadline
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+        self.listeners: List[threading.Event] = []
+        self.on_abandon: Optional[Callable[[], None]] = None
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas concurrentes: la primera ejecuta fn y las que
+    llegan mientras está en curso esperan y reciben el mismo resultado
+    (o la misma excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"executed": 0, "collapsed": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Devuelve (resultado, compartido); compartido=True si se reutilizó otra llamada.
+        timeout limita cuánto espera una llamada agrupada (TimeoutError).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+            else:
+                self._stats["collapsed"] += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Venció el plazo esperando una llamada idéntica en curso")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def share(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        deadline: Optional[Deadline] = None,
+        on_abandon: Optional[Callable[[], None]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Como do(), pero fn corre en un hilo propio y todas las llamadas (también
+        la primera) esperan igual: cada una deja de esperar cuando vence o se
+        cancela su deadline (TimeoutError) sin afectar a las demás. Si todas se
+        van antes de que termine, se llama on_abandon (p. ej. cancelar la
+        sentencia en el servidor).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                call.on_abandon = on_abandon
+                self._stats["executed"] += 1
+            else:
+                self._stats["collapsed"] += 1
+            call.waiters += 1
+            woke = threading.Event()
+            call.listeners.append(woke)
+        if leader:
+            threading.Thread(target=self._run, args=(key, call, fn), name="singleflight", daemon=True).start()
+
+        if deadline is not None:
+            deadline.arm(woke.set)
+        try:
+            woke.wait()
+        finally:
+            if deadline is not None:
+                deadline.disarm()
+
+        if not call.done.is_set():
+            with self._lock:
+                call.waiters -= 1
+                abandon = call.waiters == 0 and not call.done.is_set()
+                if abandon and self._calls.get(key) is call:
+                    # Las llamadas que lleguen ahora empiezan de cero
+                    del self._calls[key]
+            if abandon and call.on_abandon is not None:
+                call.on_abandon()
+            raise TimeoutError("Venció el plazo esperando una llamada idéntica en curso")
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> None:
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.done.set()
+                listeners, call.listeners = call.listeners, []
+            for woke in listeners:
+                woke.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
@@ -0,0 +1,118 @@
+# database/sql/slow_query_log.py
+"""
+Log de queries lentas: tiempos por fase (connect, execute, fetch, transform)
+y, opcionalmente, el plan estimado de SQL Server (SET SHOWPLAN_XML).
+Se escribe en un JSONL local con rotación para analizarlo offline.
+"""
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+SLOW_QUERY_MS = float(os.environ.get("NAVISION_SLOW_QUERY_MS", "1000"))
+SLOW_QUERY_LOG_PATH = os.environ.get(
+    "NAVISION_SLOW_QUERY_LOG", str(PROJECT_ROOT / "logs" / "slow_queries.jsonl")
+)
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get("NAVISION_SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get("NAVISION_SLOW_QUERY_LOG_BACKUPS", "5"))
+# "1" = no escribir los valores de los parámetros
+SLOW_QUERY_REDACT = os.environ.get("NAVISION_SLOW_QUERY_REDACT", "0") == "1"
+# "1" = capturar el plan estimado de las queries lentas (una ida y vuelta extra)
+SLOW_QUERY_SHOWPLAN = os.environ.get("NAVISION_SLOW_QUERY_SHOWPLAN", "0") == "1"
+# Segundos como mucho para obtener ese plan (además, nunca más de lo que quede del plazo de la query)
+SLOW_QUERY_PLAN_TIMEOUT = float(os.environ.get("NAVISION_SLOW_QUERY_PLAN_TIMEOUT", "5"))
+
+class QueryTimings:
+    """Acumula milisegundos por fase de una ejecución."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds * 1000.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.phases.values())
+
+_LOGGER: Optional[logging.Logger] = None
+_LOGGER_LOCK = threading.Lock()
+
+def _get_logger() -> logging.Logger:
+    global _LOGGER
+    with _LOGGER_LOCK:
+        if _LOGGER is None:
+            Path(SLOW_QUERY_LOG_PATH).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                SLOW_QUERY_LOG_PATH,
+                maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("navision.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _LOGGER = logger
+        return _LOGGER
+
+def is_slow(timings: QueryTimings) -> bool:
+    return timings.total_ms >= SLOW_QUERY_MS
+
+def capture_plan(conn, sql: str, args: Sequence[Any]) -> Optional[str]:
+    """
+    Plan estimado en XML. Con SHOWPLAN_XML activo SQL Server no ejecuta la
+    sentencia, solo devuelve el plan. Si falla se devuelve None.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SET SHOWPLAN_XML ON")
+        cur.execute(sql, args)
+        row = cur.fetchone()
+        return row[0] if row else None
+    except Exception:
+        return None
+    finally:
+        try:
+            cur.execute("SET SHOWPLAN_XML OFF")
+        except Exception:
+            pass
+        cur.close()
+
+def record(
+    query_key: str,
+    sql: str,
+    args: Sequence[Any],
+    rowcount: int,
+    timings: QueryTimings,
+    plan: Optional[str] = None,
+) -> None:
+    """Escribe una línea JSON con la query lenta."""
+    entry = {
+        "ts": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "query_key": query_key,
+        "total_ms": round(timings.total_ms, 3),
+        "phases_ms": {k: round(v, 3) for k, v in timings.phases.items()},
+        "rowcount": rowcount,
+        "sql": sql,
+        "params": ["***"] * len(args) if SLOW_QUERY_REDACT else list(args),
+        "plan_xml": plan,
+    }
+    _get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
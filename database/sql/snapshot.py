@@ -0,0 +1,45 @@
+# database/sql/snapshot.py
+from concurrent.futures import wait
+from typing import Any, Dict, List, Optional
+
+from database.sql import tracing
+from database.sql.executor import execute_query, get_worker_pool
+from database.sql.registry import REGISTRY
+
+def obra_queries() -> List[str]:
+    """Queries del REGISTRY que solo necesitan el código de obra."""
+    return [
+        qk for qk, spec in REGISTRY.items()
+        if set(spec.param_order) <= {"obra_code"} and set(spec.required_params) <= {"obra_code"}
+    ]
+
+def obra_snapshot(obra_code: str, query_keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Lanza en paralelo todas las queries de una obra (cada una con su conexión
+    del pool) y junta los resultados, así la latencia total es la de la query
+    más lenta y no la suma.
+    Devuelve {"obra_code", "results": {query_key: resultado}, "errors": {query_key: mensaje}};
+    un fallo en una query no impide devolver las demás.
+    """
+    keys = obra_queries() if query_keys is None else list(query_keys)
+    unknown = [qk for qk in keys if qk not in REGISTRY]
+    if unknown:
+        raise ValueError(f"Queries desconocidas: {unknown}")
+
+    pool = get_worker_pool()
+    # with_context: las queries de los hilos del pool conservan el request id y el span padre
+    futures = {
+        qk: pool.submit(tracing.with_context(execute_query), {"query_key": qk, "obra_code": obra_code})
+        for qk in keys
+    }
+    wait(futures.values())
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for qk, fut in futures.items():
+        exc = fut.exception()
+        if exc is None:
+            results[qk] = fut.result()
+        else:
+            errors[qk] = f"{type(exc).__name__}: {exc}"
+    return {"obra_code": obra_code, "results": results, "errors": errors}
@@ -0,0 +1,208 @@
+# database/sql/tracing.py
+"""
+Trazas de la petición NL->SQL: spans con nombre, duración y atributos (prompt,
+llamada al LLM con sus tokens, parseo de tool calls, ejecución SQL y limpieza
+de filas) que comparten un request id.
+
+El request id y el span en curso viajan en contextvars; para que lleguen a
+los hilos del pool hay que lanzar el trabajo con with_context(fn).
+
+Exportación (TRACE_EXPORT):
+- "" (por defecto): desactivado, los spans no cuestan nada.
+- "console": una línea por span (INFO) en el logger "navision.trace"; si el
+  proceso no ha configurado logging (uso como librería, benchmarks, replay)
+  se le añade un handler propio para que las trazas se vean igualmente.
+- "file": formato Chrome Trace Event, un JSON por proceso en TRACE_DIR
+  (se abre con chrome://tracing o https://ui.perfetto.dev).
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+TRACE_EXPORT = os.environ.get("TRACE_EXPORT", "").strip().lower()
+TRACE_DIR = os.environ.get("TRACE_DIR", str(PROJECT_ROOT / "logs" / "traces"))
+
+REQUEST_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_CURRENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_IDS = itertools.count(1)
+
+_LOG = logging.getLogger("navision.trace")
+
+class Span:
+    """Un tramo de la petición; set() añade atributos mientras está abierto."""
+
+    __slots__ = ("name", "span_id", "parent_id", "request_id", "attrs", "start_us", "_t0")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = next(_IDS)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.request_id = REQUEST_ID.get()
+        self.attrs = attrs
+        self.start_us = time.time_ns() // 1000
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+
+class _FileExporter:
+    """JSON de Chrome Trace Event (array de eventos "X"); se cierra al salir."""
+
+    def __init__(self, directory: str):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(directory, f"trace-{stamp}-{os.getpid()}.json")
+        self._lock = threading.Lock()
+        self._fh = open(self.path, "w", encoding="utf-8")
+        self._fh.write("[\n")
+        self._first = True
+        atexit.register(self.close)
+
+    def export(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._fh.closed:
+                return
+            self._fh.write(line if self._first else ",\n" + line)
+            self._first = False
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.write("\n]\n")
+                self._fh.close()
+
+_TRACE_HANDLER: Optional[logging.Handler] = None
+
+class _ConsoleExporter:
+    def __init__(self):
+        global _TRACE_HANDLER
+        # TRACE_EXPORT=console es una petición explícita de ver las trazas
+        if not _LOG.handlers and not logging.getLogger().handlers:
+            _TRACE_HANDLER = _console_handler()
+            _LOG.addHandler(_TRACE_HANDLER)
+            _LOG.propagate = False
+        if _LOG.getEffectiveLevel() > logging.INFO:
+            _LOG.setLevel(logging.INFO)
+
+    def export(self, event: Dict[str, Any]) -> None:
+        _LOG.info("%s %.1f ms %s", event["name"], event["dur"] / 1000.0,
+                  json.dumps(event["args"], ensure_ascii=False, default=str))
+
+_EXPORTER: Any = None
+_EXPORTER_LOCK = threading.Lock()
+
+def _exporter() -> Any:
+    global _EXPORTER
+    if _EXPORTER is None:
+        with _EXPORTER_LOCK:
+            if _EXPORTER is None:
+                _EXPORTER = _FileExporter(TRACE_DIR) if TRACE_EXPORT == "file" else _ConsoleExporter()
+    return _EXPORTER
+
+def enabled() -> bool:
+    return TRACE_EXPORT in ("console", "file")
+
+def _export(span: Span, dur_us: int) -> None:
+    args = {"request_id": span.request_id, "span_id": span.span_id, "parent_id": span.parent_id, **span.attrs}
+    _exporter().export({
+        "name": span.name, "cat": "nl2sql", "ph": "X", "ts": span.start_us, "dur": dur_us,
+        "pid": os.getpid(), "tid": threading.get_native_id(), "args": args,
+    })
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    """Abre un span hijo del actual; si sale con excepción queda anotada en "error"."""
+    if not enabled():
+        yield _NOOP
+        return
+    s = Span(name, _CURRENT.get(), attrs)
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _CURRENT.reset(token)
+        _export(s, int((time.perf_counter() - s._t0) * 1_000_000))
+
+def annotate(**attrs: Any) -> None:
+    """Añade atributos al span en curso (si lo hay)."""
+    s = _CURRENT.get()
+    if s is not None:
+        s.set(**attrs)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+@contextmanager
+def request(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Fija el request id de lo que se ejecute dentro. Sin request_id se genera
+    uno, salvo que ya haya uno en curso (p. ej. una petición dentro de un lote).
+    """
+    current = REQUEST_ID.get()
+    rid = request_id or current or new_request_id()
+    token = REQUEST_ID.set(rid)
+    try:
+        yield rid
+    finally:
+        REQUEST_ID.reset(token)
+
+def with_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """fn ejecutándose con el contexto actual (request id y span) en otro hilo."""
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return ctx.run(fn, *args, **kwargs)
+    return run
+
+# --- logging ---
+class RequestIdFilter(logging.Filter):
+    """Añade %(request_id)s a los registros de log."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get() or "-"
+        return True
+
+def _console_handler() -> logging.Handler:
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    return handler
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Logging en consola con el request id de cada línea; el nivel sale de
+    LOG_LEVEL (INFO por defecto; DEBUG muestra el detalle del router y del LLM).
+    """
+    global _TRACE_HANDLER
+    if _TRACE_HANDLER is not None:
+        # Las trazas pasan a salir por el handler raíz
+        _LOG.removeHandler(_TRACE_HANDLER)
+        _LOG.propagate = True
+        _TRACE_HANDLER = None
+    root = logging.getLogger()
+    root.handlers[:] = [_console_handler()]
+    root.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
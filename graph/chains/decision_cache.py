@@ -0,0 +1,235 @@
+# graph/chains/decision_cache.py
+"""
+Caché semántica de decisiones del LLM: guarda qué tools se eligieron para
+cada pregunta con el código de obra enmascarado y, ante una pregunta parecida
+(coseno por encima del umbral) que pide el mismo número de tools, las
+reutiliza con el código nuevo sin volver a llamar al modelo.
+
+Desactivada por defecto porque ninguna de las dos opciones de embedding sale
+gratis:
+- "hashed" (por defecto): n-gramas con hashing, local y sin coste, pero solo
+  reconoce preguntas casi idénticas, así que rara vez evita una llamada al LLM.
+  Sirve para pruebas.
+- "vertex:<modelo>": embeddings de Vertex AI, que captan sinónimos como
+  "móvil" / "teléfono", pero cada pregunta que llega a la caché (las que el
+  pre-router no resuelve) paga una llamada de embeddings y su latencia, acierte
+  o no. Compensa solo si la tasa de aciertos (stats()) es alta frente al coste
+  del LLM que se ahorra; medirla antes de dejarla activada.
+Para activarla: DECISION_CACHE_ENABLED=1 y DECISION_CACHE_EMBEDDINGS.
+El vector de una consulta fallida se reutiliza al guardar la decisión del LLM,
+así que cada pregunta cuesta como mucho un embedding.
+"""
+import atexit
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from graph.chains.intent_router import explicit_obra_code, extract_obra_code, normalize
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+DECISION_CACHE_ENABLED = os.environ.get("DECISION_CACHE_ENABLED", "0") == "1"
+DECISION_CACHE_PATH = os.environ.get(
+    "DECISION_CACHE_PATH", str(PROJECT_ROOT / "data" / "cache" / "decision_cache.json")
+)
+DECISION_CACHE_MAX_ENTRIES = int(os.environ.get("DECISION_CACHE_MAX_ENTRIES", "1000"))
+DECISION_CACHE_THRESHOLD = float(os.environ.get("DECISION_CACHE_THRESHOLD", "0.85"))
+DECISION_CACHE_EMBEDDINGS = os.environ.get("DECISION_CACHE_EMBEDDINGS", "hashed")
+# Segundos mínimos entre dos escrituras del snapshot (siempre se guarda al salir)
+DECISION_CACHE_SAVE_EVERY = 30.0
+# Últimos vectores calculados (lookup y store de una misma pregunta)
+_RECENT_VECTORS = 256
+
+_HASH_DIM = 1 << 18
+# Palabras vacías que comparten casi todas las preguntas y solo inflan el parecido
+_STOPWORDS = frozenset(
+    "a al de del el en la las lo los me mi por que se su un una y dame dime obra #".split()
+)
+_NUMBER = re.compile(r"\b\d{2,6}\b")
+Vector = Dict[int, float]
+
+def mask_obra_code(text: str) -> str:
+    """Pregunta normalizada con los códigos de obra sustituidos por '#'."""
+    return " ".join(_NUMBER.sub("#", normalize(text)).split())
+
+def _unit(vec: Vector) -> Vector:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items()} if norm else vec
+
+def hashed_embedding(text: str) -> Vector:
+    """Vector disperso de palabras y trigramas de caracteres (hashing estable)."""
+    vec: Vector = {}
+    for word in re.findall(r"\w+|#", text):
+        if word in _STOPWORDS:
+            continue
+        features = [(f"w:{word}", 1.0)]
+        padded = f" {word} "
+        features += [(f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+        for feat, weight in features:
+            idx = zlib.crc32(feat.encode("utf-8")) % _HASH_DIM
+            vec[idx] = vec.get(idx, 0.0) + weight
+    return _unit(vec)
+
+def _vertex_embedder(model: str) -> Callable[[str], Sequence[float]]:
+    # El cliente se crea en la primera consulta, no al importar
+    client = []
+
+    def embed(text: str) -> Sequence[float]:
+        if not client:
+            from langchain_google_vertexai import VertexAIEmbeddings
+            client.append(VertexAIEmbeddings(model_name=model))
+        return client[0].embed_query(text)
+    return embed
+
+def _as_vector(v: Union[Vector, Sequence[float]]) -> Vector:
+    return v if isinstance(v, dict) else _unit({i: float(x) for i, x in enumerate(v) if x})
+
+def _cosine(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+class DecisionCache:
+    """
+    Índice en memoria (LRU acotado) de pregunta enmascarada -> (vector, tools).
+    Thread-safe; se persiste en un JSON para sobrevivir a reinicios.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = DECISION_CACHE_MAX_ENTRIES,
+        threshold: float = DECISION_CACHE_THRESHOLD,
+        embed: Optional[Callable[[str], Union[Vector, Sequence[float]]]] = None,
+        embed_name: str = "hashed",
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.embed = embed or hashed_embedding
+        self.embed_name = embed_name
+        self._lock = threading.Lock()
+        # pregunta enmascarada -> (vector, tools en el orden del LLM); el orden es el de uso
+        self._entries: "OrderedDict[str, Tuple[Vector, Tuple[str, ...]]]" = OrderedDict()
+        self._dirty = False
+        self._saved_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0, "embeddings": 0}
+        self._recent: "OrderedDict[str, Vector]" = OrderedDict()
+        if path:
+            self.load()
+
+    def _vector(self, masked: str) -> Vector:
+        # Con vertex cada embedding es una llamada de pago: no repetirla al guardar
+        with self._lock:
+            vec = self._recent.get(masked)
+        if vec is None:
+            vec = _as_vector(self.embed(masked))
+            with self._lock:
+                self._stats["embeddings"] += 1
+                self._recent[masked] = vec
+                if len(self._recent) > _RECENT_VECTORS:
+                    self._recent.popitem(last=False)
+        return vec
+
+    def lookup(self, text: str, tool_calls: int = 1) -> Optional[List[Dict[str, Any]]]:
+        """
+        Intents con las tools de la pregunta más parecida y el código de obra
+        de esta. Como en el pre-router, solo con un código explícito ("obra
+        855"), y solo entre decisiones de tool_calls tools (las que parece
+        pedir la pregunta): una de una tool no vale para "contactos y precio".
+        """
+        obra_code = explicit_obra_code(text)
+        if obra_code is None:
+            return None
+        masked = mask_obra_code(text)
+        vec = self._vector(masked)
+        with self._lock:
+            best_key, best_sim = None, 0.0
+            for key, (other, tools) in self._entries.items():
+                if len(tools) != tool_calls:
+                    continue
+                sim = _cosine(vec, other)
+                if sim > best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is None or best_sim < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["hits"] += 1
+            tools = self._entries[best_key][1]
+        return [{"query_key": tool, "obra_code": obra_code} for tool in tools]
+
+    def store(self, text: str, intents: List[Dict[str, Any]]) -> None:
+        """
+        Guarda la decisión si es reutilizable: cada tool solo recibe obra_code
+        y es el mismo código que aparece en la pregunta.
+        """
+        obra_code = extract_obra_code(text)
+        if not intents or any(
+            {k: v for k, v in i.items() if k != "query_key"} != {"obra_code": obra_code} for i in intents
+        ):
+            return
+        masked = mask_obra_code(text)
+        vec = self._vector(masked)
+        with self._lock:
+            self._entries.pop(masked, None)
+            self._entries[masked] = (vec, tuple(i["query_key"] for i in intents))
+            self._stats["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._dirty = True
+            due = time.monotonic() - self._saved_at > DECISION_CACHE_SAVE_EVERY
+        if due:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    # --- persistencia ---
+    def load(self) -> None:
+        try:
+            data = json.loads(Path(self.path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        # Vectores de otro modelo de embeddings no son comparables
+        if data.get("embeddings") != self.embed_name:
+            return
+        with self._lock:
+            for masked, vec, tools in data.get("entries", [])[-self.max_entries:]:
+                # Los snapshots anteriores guardaban una sola tool
+                tools = (tools,) if isinstance(tools, str) else tuple(tools)
+                self._entries[masked] = ({int(k): v for k, v in vec.items()}, tools)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[m, vec, list(tools)] for m, (vec, tools) in self._entries.items()]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"embeddings": self.embed_name, "entries": entries}), encoding="utf-8")
+        os.replace(tmp, path)
+
+def _default_cache() -> DecisionCache:
+    if DECISION_CACHE_EMBEDDINGS.startswith("vertex:"):
+        model = DECISION_CACHE_EMBEDDINGS.split(":", 1)[1]
+        return DecisionCache(DECISION_CACHE_PATH, embed=_vertex_embedder(model),
+                             embed_name=DECISION_CACHE_EMBEDDINGS)
+    return DecisionCache(DECISION_CACHE_PATH)
+
+DECISION_CACHE = _default_cache()
+atexit.register(DECISION_CACHE.save)
@@ -0,0 +1,192 @@
+# graph/chains/intent_router.py
+"""
+Pre-router determinista: intenta resolver tool y argumentos sin llamar al LLM
+puntuando palabras clave por tool (tools.routing.ROUTING_KEYWORDS) y extrayendo
+el código de obra de la pregunta. Solo decide cuando está claro; si no, la
+pregunta sigue al LLM.
+
+Comprobación de los casos conocidos (sale con error si alguno falla):
+    python -m graph.chains.intent_router
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.routing import ROUTING_KEYWORDS
+
+ROUTER_ENABLED = os.environ.get("INTENT_ROUTER_ENABLED", "1") != "0"
+# Puntuación mínima de la mejor tool y ventaja sobre la segunda para saltarse el LLM
+ROUTER_MIN_SCORE = float(os.environ.get("INTENT_ROUTER_MIN_SCORE", "2"))
+ROUTER_MIN_MARGIN = float(os.environ.get("INTENT_ROUTER_MIN_MARGIN", "2"))
+
+# "obra 855", "obra nº 855", "proyecto 855", "job 855"...
+_OBRA_CODE_EXPLICIT = re.compile(r"\b(?:obra|proyecto|job)\s*(?:n[ºo°]?\.?\s*|numero\s*|codigo\s*)?(\d{2,6})\b")
+# Números sueltos ("la 855"); solo se usan si hay exactamente uno y nunca
+# para saltarse el LLM ("hitos de 2019" es un año, no una obra)
+_NUMBER = re.compile(r"\b\d{2,6}\b")
+
+# "... y el precio", "... y sus fechas": otra petición; "cargo, nombre y móvil" es una lista
+_CLAUSE_JOIN = re.compile(
+    r"\by\s+(?:el|la|los|las|lo|su|sus|que|cual|cuales|cuando|cuanto|cuanta|cuantos|cuantas"
+    r"|como|quien|tambien|ademas|dame|dime)\b"
+)
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin tildes, para comparar con las palabras clave."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def extract_obra_code(text: str) -> Optional[str]:
+    """Código de obra mencionado en la pregunta (None si no hay o es ambiguo)."""
+    norm = normalize(text)
+    explicit = set(_OBRA_CODE_EXPLICIT.findall(norm))
+    if len(explicit) == 1:
+        return explicit.pop()
+    if explicit:
+        return None
+    numbers = set(_NUMBER.findall(norm))
+    return numbers.pop() if len(numbers) == 1 else None
+
+def explicit_obra_code(text: str) -> Optional[str]:
+    """Código escrito como "obra 855" / "proyecto 855" (None si no hay o hay varios)."""
+    explicit = set(_OBRA_CODE_EXPLICIT.findall(normalize(text)))
+    return explicit.pop() if len(explicit) == 1 else None
+
+def _score(norm: str, keywords: Dict[str, float]) -> float:
+    tokens = re.findall(r"\w+", norm)
+    score = 0.0
+    for kw, weight in keywords.items():
+        if " " in kw:
+            hit = kw in norm
+        else:
+            # Raíz: "contacto" vale para "contactos", "adjudica" para "adjudicacion"
+            hit = any(t.startswith(kw) for t in tokens)
+        if hit:
+            score += weight
+    return score
+
+@dataclass(frozen=True)
+class RouteDecision:
+    action: str                    # "tool" (saltar el LLM), "reject" o "llm"
+    tool: Optional[str] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+    scores: Tuple[Tuple[str, float], ...] = ()
+    reason: str = ""
+    # Parece pedir varias cosas: ni pre-router ni caché de decisiones, decide el LLM
+    multi_intent: bool = False
+
+    @property
+    def intent(self) -> Dict[str, Any]:
+        return {"query_key": self.tool, **self.args}
+
+def route(text: str, keywords: Dict[str, Dict[str, float]] = None) -> RouteDecision:
+    """
+    - tool: hay código de obra explícito ("obra 855"), la pregunta pide una sola
+      cosa y una tool gana con puntuación y margen suficientes.
+    - reject: ni código de obra ni ninguna palabra clave (p. ej. "receta de una pizza").
+    - llm: cualquier otro caso, decide el modelo.
+    """
+    keywords = ROUTING_KEYWORDS if keywords is None else keywords
+    norm = normalize(text)
+    ranked: List[Tuple[str, float]] = sorted(
+        ((name, _score(norm, kws)) for name, kws in keywords.items()),
+        key=lambda x: x[1], reverse=True,
+    )
+    obra_code = extract_obra_code(text)
+    best_name, best = ranked[0] if ranked else (None, 0.0)
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    # Una segunda tool con palabras clave o dos frases unidas por "y"
+    multi = second > 0 or _CLAUSE_JOIN.search(norm) is not None
+
+    def llm(reason: str) -> RouteDecision:
+        return RouteDecision("llm", scores=tuple(ranked), reason=reason, multi_intent=multi)
+
+    if obra_code is None and best == 0:
+        return RouteDecision("reject", scores=tuple(ranked), reason="sin código de obra ni palabras clave")
+    if obra_code is None:
+        return llm("sin código de obra")
+    if explicit_obra_code(text) is None:
+        return llm(f"número {obra_code} sin 'obra' ni 'proyecto'")
+    if multi:
+        return llm(f"varias peticiones ({best:g} vs {second:g})")
+    if best >= ROUTER_MIN_SCORE and best - second >= ROUTER_MIN_MARGIN:
+        return RouteDecision(
+            "tool", best_name, {"obra_code": obra_code}, tuple(ranked),
+            reason=f"puntuación {best:g} (siguiente {second:g})",
+        )
+    return llm(f"poco margen ({best:g} vs {second:g})")
+
+def expected_tool_calls(scores: Tuple[Tuple[str, float], ...]) -> int:
+    """Tools que parece pedir la pregunta: las que puntúan alguna palabra clave (al menos una)."""
+    return max(1, sum(1 for _, s in scores if s > 0))
+
+class RouterStats:
+    """Contadores del pre-router y estimación del tiempo de LLM ahorrado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"routed": 0, "bypassed": 0, "rejected": 0, "llm": 0}
+        self._llm_ms_total = 0.0
+
+    def record(self, action: str, llm_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self._stats["routed"] += 1
+            self._stats[{"tool": "bypassed", "reject": "rejected"}.get(action, "llm")] += 1
+            if llm_ms is not None:
+                self._llm_ms_total += llm_ms
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self._stats)
+            avg_llm_ms = self._llm_ms_total / s["llm"] if s["llm"] else 0.0
+        skipped = s["bypassed"] + s["rejected"]
+        return {
+            **s,
+            "bypass_rate": round(skipped / s["routed"], 3) if s["routed"] else 0.0,
+            "avg_llm_ms": round(avg_llm_ms, 1),
+            # Cada pregunta resuelta localmente se habría llevado una llamada media al LLM
+            "saved_ms": round(skipped * avg_llm_ms, 1),
+        }
+
+ROUTER_STATS = RouterStats()
+
+# Pregunta -> (acción, tool, multi_intent) esperados; los de varias peticiones
+# no deben resolverse sin el LLM ni por la caché de decisiones
+ROUTER_CASES = [
+    ("Dame cargo, nombre y móvil de la obra 855", "tool", "contactos_obra_por_codigo", False),
+    ("dame el precio de la obra 812", "tool", "precio_obra_por_codigo", False),
+    ("hitos de la obra 2019", "tool", "cronograma_hitos_por_codigo", False),
+    ("Dame cargo, nombre y móvil y el precio de la obra 812", "llm", None, True),
+    ("teléfono del encargado de la 855 y sus fechas clave", "llm", None, True),
+    ("teléfono del encargado de la obra 855 y sus fechas clave", "llm", None, True),
+    ("móvil del jefe de obra 855 y cuándo se firmó el contrato", "llm", None, True),
+    ("hitos de 2019", "llm", None, False),
+    ("teléfono del encargado de la 855", "llm", None, False),
+    ("receta de una pizza", "reject", None, False),
+]
+
+def check_cases(cases=None) -> List[str]:
+    """Casos de ROUTER_CASES cuya decisión no es la esperada (vacío si todo va bien)."""
+    failures = []
+    for question, action, tool, multi in ROUTER_CASES if cases is None else cases:
+        d = route(question)
+        if (d.action, d.tool, d.multi_intent) != (action, tool, multi):
+            failures.append(f"{question!r}: esperaba {action}/{tool}/multi={multi}, "
+                            f"salió {d.action}/{d.tool}/multi={d.multi_intent} ({d.reason})")
+    return failures
+
+def main():
+    argparse.ArgumentParser(description="Comprueba las decisiones del pre-router en los casos conocidos").parse_args()
+    failures = check_cases()
+    print(f"🧭 {len(ROUTER_CASES) - len(failures)}/{len(ROUTER_CASES)} casos del pre-router correctos")
+    for f in failures:
+        print(f"   ❌ {f}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# graph/chains/llm_cache.py
+"""
+Caché en disco (SQLite) de respuestas del LLM. Con temperature=0 la respuesta
+solo depende del prompt, del modelo y de las tools enlazadas, así que se
+guarda con esa clave. Cada entrada lleva la huella (modelo + esquema de tools
++ prompt de sistema) con la que se generó; al abrir la caché se borran las de
+otra huella, de modo que cambiar una tool o el SYSTEM la invalida sola.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", str(PROJECT_ROOT / "data" / "cache" / "llm_responses.sqlite"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Los aciertos solo actualizan last_used en memoria; se escriben en bloque cada
+# tantos aciertos o segundos (y antes de desalojar o al salir)
+LLM_CACHE_TOUCH_BATCH = 256
+LLM_CACHE_TOUCH_EVERY = 30.0
+
+def _sha256(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def tools_hash(tools: Sequence[Any]) -> str:
+    """Hash de los esquemas de las tools tal y como se envían al modelo."""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return _sha256([convert_to_openai_tool(t) for t in tools])
+
+def fingerprint(model: Optional[str], tools: Sequence[Any], system: str) -> str:
+    return _sha256({"model": model, "tools": tools_hash(tools), "system": _sha256(system)})
+
+def normalize_messages(messages: Sequence[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    # Espacios repetidos o en los extremos no cambian la pregunta
+    return [(role, " ".join(str(content).split())) for role, content in messages]
+
+class ResponseCache:
+    """Respuestas del LLM por (huella, prompt normalizado), acotadas en bytes (LRU)."""
+
+    def __init__(self, path: str, fingerprint: str, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0}
+        # key -> último uso pendiente de escribir
+        self._touched: Dict[str, float] = {}
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Se abre en el primer uso; bajo self._lock
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, response TEXT, bytes INTEGER, last_used REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses(last_used)")
+            stale = conn.execute("DELETE FROM responses WHERE fingerprint <> ?", (self.fingerprint,)).rowcount
+            conn.commit()
+            if stale:
+                logger.info("Caché LLM: %d respuestas descartadas (cambió el modelo, las tools o el SYSTEM)", stale)
+            self._conn = conn
+        return self._conn
+
+    def _key(self, messages: Sequence[Tuple[str, str]], tools: Sequence[str] = ()) -> str:
+        # tools: nombres de las tools enlazadas si es un subconjunto (tool_index)
+        return _sha256([self.fingerprint, normalize_messages(messages)] + ([list(tools)] if tools else []))
+
+    def get(self, messages: Sequence[Tuple[str, str]], tools: Sequence[str] = ()) -> Optional["AIMessage"]:
+        key = self._key(messages, tools)
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            # Sin escribir en cada acierto: el UPDATE + commit serializaría las lecturas
+            self._touched[key] = time.time()
+            self._stats["hits"] += 1
+            if (len(self._touched) >= LLM_CACHE_TOUCH_BATCH
+                    or time.monotonic() - self._flushed_at > LLM_CACHE_TOUCH_EVERY):
+                self._flush_locked()
+        from langchain_core.messages import AIMessage
+
+        data = json.loads(row[0])
+        return AIMessage(content=data["content"], tool_calls=data["tool_calls"])
+
+    def set(self, messages: Sequence[Tuple[str, str]], ai: "AIMessage", tools: Sequence[str] = ()) -> None:
+        payload = json.dumps(
+            {"content": ai.content, "tool_calls": [
+                {"name": c["name"], "args": c["args"], "id": c.get("id")} for c in ai.tool_calls
+            ]},
+            ensure_ascii=False, default=str,
+        )
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connection()
+            # El desalojo (LRU) necesita los last_used al día
+            self._flush_locked(commit=False)
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (self._key(messages, tools), self.fingerprint, payload, size, time.time()),
+            )
+            self._stats["stored"] += 1
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+            while total > self.max_bytes:
+                key, nbytes = conn.execute(
+                    "SELECT key, bytes FROM responses ORDER BY last_used LIMIT 1"
+                ).fetchone()
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= nbytes
+                self._stats["evictions"] += 1
+            conn.commit()
+
+    def flush(self) -> None:
+        """Escribe los last_used pendientes de los aciertos."""
+        with self._lock:
+            if self._touched:
+                self._flush_locked()
+
+    def _flush_locked(self, commit: bool = True) -> None:
+        touched, self._touched = self._touched, {}
+        self._flushed_at = time.monotonic()
+        if not touched:
+            return
+        conn = self._connection()
+        conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                         [(ts, key) for key, ts in touched.items()])
+        if commit:
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._connection().execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses").fetchone()
+            return {**self._stats, "entries": row[0], "bytes": row[1]}
@@ -0,0 +1,341 @@
+# graph/chains/replay.py
+"""
+Grabación y reproducción de la cadena NL->SQL para probarla y medirla sin
+Vertex ni Navision.
+
+- record: por cada pregunta del corpus llama al modelo real (con las tools que
+  elegiría la cadena) y ejecuta en Navision los intents que devuelve, sin
+  cachés. Guarda respuestas y resultados en un JSON (cassette).
+- replay: FakeChatModel y StandInExecutor responden desde el cassette con una
+  latencia inyectada configurable; se instalan en la cadena con
+  set_chat_model / set_executor y run_nl_to_sql funciona igual que en real.
+
+Uso (desde la raíz del proyecto):
+    python -m graph.chains.replay record --corpus preguntas.txt
+    python -m graph.chains.replay replay   # comprueba que la cadena elige las tools grabadas
+La latencia por etapa se mide con database/sql/benchmarks/bench_chain.py.
+"""
+import argparse
+import asyncio
+import builtins
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from database.sql.registry import REGISTRY
+from graph.chains.intent_router import route
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CASSETTE = str(PROJECT_ROOT / "data" / "replay" / "cassette.json")
+
+def _question_key(text: str) -> str:
+    return " ".join(text.split())
+
+def _intent_key(intent: Dict[str, Any]) -> str:
+    return json.dumps(intent, sort_keys=True, ensure_ascii=False, default=str)
+
+def disable_caches() -> None:
+    """
+    Apaga la caché de respuestas y la de decisiones para que cada pregunta
+    llegue al modelo falso y no se escriba en las cachés reales; hay que
+    llamarla antes de importar la cadena.
+    """
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+    os.environ.setdefault("DECISION_CACHE_ENABLED", "0")
+
+def default_corpus() -> List[str]:
+    """Preguntas de ejemplo del REGISTRY más las de main.py."""
+    questions = [q for spec in REGISTRY.values() for q in spec.examples]
+    return questions + ["Dame la receta de una pizza"]
+
+def load_corpus(path: Optional[str]) -> List[str]:
+    # Una pregunta por línea; las vacías y las que empiezan por '#' se ignoran
+    if not path:
+        return default_corpus()
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [ln.strip() for ln in lines if ln.strip() and not ln.startswith("#")]
+
+class Cassette:
+    """Respuestas del LLM por pregunta y resultados del executor por intent."""
+
+    def __init__(self, responses: Optional[Dict[str, Any]] = None, results: Optional[Dict[str, Any]] = None):
+        self.responses: Dict[str, Dict[str, Any]] = responses or {}
+        self.results: Dict[str, Dict[str, Any]] = results or {}
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(data["responses"], data["results"])
+
+    def save(self, path: str) -> None:
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(
+            json.dumps({"responses": self.responses, "results": self.results},
+                       ensure_ascii=False, indent=1, default=str),
+            encoding="utf-8",
+        )
+
+    def response(self, question: str) -> Dict[str, Any]:
+        try:
+            return self.responses[_question_key(question)]
+        except KeyError:
+            raise RuntimeError(f"Pregunta sin grabar en el cassette: {question!r}") from None
+
+    def result(self, intent: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self.results[_intent_key(intent)]
+        except KeyError:
+            raise RuntimeError(f"Intent sin grabar en el cassette: {intent}") from None
+
+class Latency:
+    """Latencia inyectada: ms fijos más un ruido uniforme de ±jitter (fracción)."""
+
+    def __init__(self, ms: float = 0.0, jitter: float = 0.0, seed: int = 42):
+        self.ms = ms
+        self.jitter = jitter
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self) -> float:
+        with self._lock:
+            noise = self._rnd.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.ms * (1 + noise)) / 1000.0
+
+class StageTimer:
+    """Tiempo acumulado (ms) y llamadas de una etapa, para atribuir la latencia."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_ms = 0.0
+        self.calls = 0
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self.total_ms += ms
+            self.calls += 1
+
+    def snapshot(self) -> Tuple[float, int]:
+        with self._lock:
+            return self.total_ms, self.calls
+
+# --- replay ---
+class _FakeBound:
+    def __init__(self, model: "FakeChatModel", tool_names: Tuple[str, ...]):
+        self.model = model
+        self.tool_names = tool_names
+
+    def invoke(self, messages: Sequence[Tuple[str, str]], **kwargs: Any):
+        t0 = time.perf_counter()
+        time.sleep(self.model.latency.seconds())
+        ai = self.model.answer(messages)
+        self.model.timer.add((time.perf_counter() - t0) * 1000)
+        return ai
+
+    async def ainvoke(self, messages: Sequence[Tuple[str, str]], **kwargs: Any):
+        t0 = time.perf_counter()
+        await asyncio.sleep(self.model.latency.seconds())
+        ai = self.model.answer(messages)
+        self.model.timer.add((time.perf_counter() - t0) * 1000)
+        return ai
+
+class FakeChatModel:
+    """Sustituto de ChatVertexAI que devuelve las respuestas grabadas."""
+
+    def __init__(self, cassette: Cassette, latency: Optional[Latency] = None):
+        self.cassette = cassette
+        self.latency = latency or Latency()
+        self.timer = StageTimer()
+
+    def bind_tools(self, tools: Sequence[Any]) -> _FakeBound:
+        return _FakeBound(self, tuple(t.name for t in tools))
+
+    def answer(self, messages: Sequence[Tuple[str, str]]):
+        from langchain_core.messages import AIMessage
+
+        data = self.cassette.response(messages[-1][1])
+        return AIMessage(content=data["content"], tool_calls=data["tool_calls"],
+                         usage_metadata=data.get("usage_metadata"))
+
+class StandInExecutor:
+    """Mismo interfaz que database.sql.executor, respondiendo desde el cassette."""
+
+    def __init__(self, cassette: Cassette, latency: Optional[Latency] = None):
+        self.cassette = cassette
+        self.latency = latency or Latency()
+        self.timer = StageTimer()
+
+    def _replay(self, intent: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self.cassette.result(intent)
+        if "error" in entry:
+            exc = getattr(builtins, entry["error"], None)
+            if not (isinstance(exc, type) and issubclass(exc, Exception)):
+                exc = RuntimeError
+            raise exc(entry["message"])
+        return json.loads(json.dumps(entry["result"]))
+
+    def execute_query(self, intent: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            time.sleep(self.latency.seconds())
+            return self._replay(intent)
+        finally:
+            self.timer.add((time.perf_counter() - t0) * 1000)
+
+    async def execute_query_async(self, intent: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.sleep(self.latency.seconds())
+            return self._replay(intent)
+        finally:
+            self.timer.add((time.perf_counter() - t0) * 1000)
+
+    def execute_intents(self, intents: List[Dict[str, Any]], *args: Any, **kwargs: Any) -> List[Any]:
+        # En paralelo, como el executor real; un fallo no tumba al resto
+        def one(intent: Dict[str, Any]) -> Any:
+            try:
+                return self.execute_query(intent)
+            except Exception as e:
+                return e
+        if not intents:
+            return []
+        with ThreadPoolExecutor(len(intents)) as pool:
+            return list(pool.map(one, intents))
+
+def install(cassette: Cassette, llm_latency: Optional[Latency] = None,
+            sql_latency: Optional[Latency] = None) -> Tuple[FakeChatModel, StandInExecutor]:
+    """Conecta la cadena al cassette; uninstall() vuelve a Vertex y Navision."""
+    from graph.chains import sql_retrieval_chain as chain
+
+    model, executor = FakeChatModel(cassette, llm_latency), StandInExecutor(cassette, sql_latency)
+    chain.set_chat_model(model)
+    chain.set_executor(executor)
+    return model, executor
+
+def uninstall() -> None:
+    from graph.chains import sql_retrieval_chain as chain
+
+    chain.set_chat_model(None)
+    chain.set_executor(None)
+
+# --- record ---
+def _error_entry(e: BaseException) -> Dict[str, str]:
+    return {"error": type(e).__name__, "message": str(e)}
+
+def _record_results(cassette: Cassette, question: str, intents: List[Dict[str, Any]]) -> None:
+    # También el intent del pre-router, que en el replay puede adelantarse al modelo
+    from database.sql.executor import execute_query
+
+    local = route(question)
+    if local.action == "tool":
+        intents = intents + [local.intent]
+    for intent in intents:
+        key = _intent_key(intent)
+        if key in cassette.results:
+            continue
+        try:
+            cassette.results[key] = {"result": execute_query(intent, use_cache=False)}
+        except Exception as e:
+            cassette.results[key] = _error_entry(e)
+
+def record(questions: Sequence[str], cassette: Optional[Cassette] = None) -> Cassette:
+    """
+    Graba la respuesta del modelo real para cada pregunta (aunque el pre-router
+    la resolviera solo, para que el replay valga con el router apagado) y el
+    resultado de Navision de cada intent, sin pasar por las cachés.
+    """
+    from graph.chains import sql_retrieval_chain as chain
+
+    cassette = cassette or Cassette()
+    for q in questions:
+        messages = chain._messages(q)
+        ai = chain.get_llm(chain._tools_for(q)).invoke(messages)
+        cassette.responses[_question_key(q)] = {
+            "content": ai.content,
+            "tool_calls": [{"name": c["name"], "args": c["args"], "id": c.get("id")} for c in ai.tool_calls],
+            "usage_metadata": getattr(ai, "usage_metadata", None),
+        }
+        try:
+            intents = chain._intents_from_ai(ai)
+        except ValueError:
+            intents = []
+        _record_results(cassette, q, intents)
+    return cassette
+
+def synthetic_cassette(questions: Sequence[str]) -> Cassette:
+    """
+    Cassette sin Vertex: la "respuesta del modelo" es la tool mejor puntuada
+    por el índice de tools con el código de obra de la pregunta (ninguna si no
+    hay código) y los resultados salen del pool configurado, p. ej. la BD
+    sintética de database/sql/benchmarks/standin.py.
+    """
+    from graph.chains.intent_router import extract_obra_code
+    from graph.chains.tool_index import get_index
+
+    cassette = Cassette()
+    for q in questions:
+        obra_code = extract_obra_code(q)
+        calls = []
+        if obra_code is not None:
+            calls = [{"name": get_index().scores(q)[0][0], "args": {"obra_code": obra_code}, "id": "synthetic"}]
+        cassette.responses[_question_key(q)] = {"content": "", "tool_calls": calls, "usage_metadata": None}
+        _record_results(cassette, q, [{"query_key": c["name"], **c["args"]} for c in calls])
+    return cassette
+
+def replay(questions: Sequence[str], cassette: Cassette) -> List[Dict[str, Any]]:
+    """
+    Ejecuta run_nl_to_sql con el cassette instalado (sin latencia) y compara
+    los intents con los grabados. Devuelve una entrada por pregunta con
+    "ok" False si la cadena eligió otra tool o falló de forma distinta.
+    """
+    from graph.chains import sql_retrieval_chain as chain
+
+    install(cassette)
+    report = []
+    try:
+        for q in questions:
+            recorded = cassette.response(q)["tool_calls"]
+            entry = {"question": q, "recorded": [c["name"] for c in recorded], "ok": True, "error": None}
+            try:
+                result = chain.run_nl_to_sql(q)
+                tools = [r["tool"] for r in result["results"]] if "results" in result else [result["query_key"]]
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                tools = []
+            entry["tools"] = tools
+            # Sin tool calls grabadas se espera un error; si no, las mismas tools
+            entry["ok"] = (not tools) if not recorded else set(tools) <= set(entry["recorded"])
+            report.append(entry)
+    finally:
+        uninstall()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Grabación / reproducción de la cadena NL->SQL")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--corpus", help="Fichero con una pregunta por línea (por defecto, los ejemplos del REGISTRY)")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    args = parser.parse_args()
+
+    disable_caches()
+    questions = load_corpus(args.corpus)
+    if args.mode == "record":
+        path = Path(args.cassette)
+        cassette = record(questions, Cassette.load(args.cassette) if path.exists() else None)
+        cassette.save(args.cassette)
+        print(f"💾 {len(cassette.responses)} respuestas y {len(cassette.results)} resultados en {args.cassette}")
+        return
+
+    report = replay(questions, Cassette.load(args.cassette))
+    bad = [r for r in report if not r["ok"]]
+    for r in bad:
+        print(f"❌ {r['question']!r}: grabado {r['recorded']}, ahora {r['tools']} {r['error'] or ''}")
+    print(f"{'✅' if not bad else '⚠️'} {len(report) - len(bad)}/{len(report)} preguntas coinciden con la grabación")
+
+if __name__ == "__main__":
+    main()
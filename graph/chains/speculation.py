@@ -0,0 +1,125 @@
+# graph/chains/speculation.py
+"""
+Ejecución especulativa: cuando el pre-router no está seguro y la pregunta va
+al LLM, casi siempre puede adivinar igualmente la tool (la mejor puntuada) y
+el código de obra. La query adivinada se lanza en el pool de hilos mientras
+el modelo responde; si el modelo elige ese mismo intent se usa su resultado
+(la SQL ya ha corrido en paralelo) y, si no, se cancela en el servidor.
+
+Cuesta una query de más por cada fallo, por eso está desactivada por
+defecto (SPECULATIVE_SQL=1 para activarla).
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+
+from database.sql.deadline import Deadline
+from database.sql.registry import REGISTRY
+from graph.chains.intent_router import RouteDecision, extract_obra_code
+
+SPECULATIVE_ENABLED = os.environ.get("SPECULATIVE_SQL", "0") == "1"
+# Puntuación mínima de la mejor tool del pre-router para apostar por ella
+SPECULATIVE_MIN_SCORE = float(os.environ.get("SPECULATIVE_MIN_SCORE", "1"))
+
+def _key(intent: Dict[str, Any]) -> str:
+    return json.dumps(intent, sort_keys=True, default=str)
+
+def predict_intent(text: str, decision: RouteDecision) -> Optional[Dict[str, Any]]:
+    """
+    Intent más probable según las puntuaciones que ya calculó el pre-router
+    para text (None si no hay apuesta).
+    """
+    obra_code = extract_obra_code(text)
+    if obra_code is None or not decision.scores:
+        return None
+    tool, score = decision.scores[0]
+    if score < SPECULATIVE_MIN_SCORE or REGISTRY[tool].required_params != ["obra_code"]:
+        return None
+    return {"query_key": tool, "obra_code": obra_code}
+
+class SpeculationStats:
+    """
+    Aciertos de la especulación y tiempo de SQL solapado con el LLM. Si el LLM
+    coincide pero la query especulativa falla cuenta como "failed", no como acierto.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "hits": 0, "misses": 0, "failed": 0, "cancelled": 0}
+        self._saved_ms = 0.0
+
+    def record_hit(self, saved_ms: float) -> None:
+        with self._lock:
+            self._stats["hits"] += 1
+            self._saved_ms += saved_ms
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats["failed"] += 1
+
+    def record_miss(self, cancelled: bool) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+            if cancelled:
+                self._stats["cancelled"] += 1
+
+    def record_start(self) -> None:
+        with self._lock:
+            self._stats["started"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self._stats)
+            saved_ms = self._saved_ms
+        decided = s["hits"] + s["misses"] + s["failed"]
+        return {
+            **s,
+            "hit_rate": round(s["hits"] / decided, 3) if decided else 0.0,
+            "saved_ms": round(saved_ms, 1),
+            "avg_saved_ms": round(saved_ms / s["hits"], 1) if s["hits"] else 0.0,
+        }
+
+SPECULATION_STATS = SpeculationStats()
+
+class Speculation:
+    """Una query adivinada en curso; keep() si el LLM coincide, discard() si no."""
+
+    def __init__(self, intent: Dict[str, Any], run: Callable[..., Dict[str, Any]], pool: Executor):
+        self.intent = intent
+        self.deadline = Deadline(REGISTRY[intent["query_key"]].timeout_s)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.future: Future = pool.submit(self._run, run)
+        SPECULATION_STATS.record_start()
+
+    def _run(self, run: Callable[..., Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            # Sin coalescer: otra petición idéntica no debe engancharse a algo que se puede cancelar
+            return run(self.intent, deadline=self.deadline, coalesce=False)
+        finally:
+            self.finished = time.perf_counter()
+
+    def matches(self, intent: Dict[str, Any]) -> bool:
+        return _key(intent) == _key(self.intent)
+
+    def keep(self, llm_done: float) -> Dict[str, Any]:
+        """
+        Resultado de la query especulativa (o su excepción). Lo ahorrado es la
+        parte de la SQL que corrió mientras se esperaba al LLM.
+        """
+        try:
+            result = self.future.result()
+        except BaseException:
+            SPECULATION_STATS.record_failure()
+            raise
+        SPECULATION_STATS.record_hit((min(self.finished, llm_done) - self.started) * 1000)
+        return result
+
+    def discard(self) -> None:
+        running = not self.future.done()
+        self.deadline.cancel()
+        self.future.cancel()
+        SPECULATION_STATS.record_miss(cancelled=running)
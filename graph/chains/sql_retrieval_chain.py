@@ -1,48 +1,495 @@
+import asyncio
+import json
+import logging
 import os
+import threading
+import time
 import warnings
-from typing import Dict, Any
+from dataclasses import replace
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
-import vertexai
-from langchain_google_vertexai import ChatVertexAI
-from langchain_core.messages import AIMessage
 
-from tools.queries import TOOLS
-from database.sql.executor import execute_query
+from database.sql import tracing
+from database.sql.executor import execute_intents, execute_query, execute_query_async, get_worker_pool
+from database.sql.registry import REGISTRY
+from graph.chains.intent_router import ROUTER_ENABLED, ROUTER_STATS, RouteDecision, expected_tool_calls, route
+from graph.chains.decision_cache import DECISION_CACHE, DECISION_CACHE_ENABLED
+from graph.chains.llm_cache import LLM_CACHE_ENABLED, LLM_CACHE_PATH, ResponseCache, fingerprint
+from graph.chains.speculation import SPECULATION_STATS, SPECULATIVE_ENABLED, Speculation, predict_intent
+from graph.chains.tool_index import get_index, select_tools
+
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
+
+logger = logging.getLogger(__name__)
 
 # Suprimir warnings específicos
 warnings.filterwarnings("ignore", category=UserWarning, module="vertexai._model_garden._model_garden_models")
 warnings.filterwarnings("ignore", category=UserWarning, module="langsmith.client")
 
-SYSTEM = """Eres un asistente que mapea lenguaje natural a UNA sola herramienta.
-Elige exactamente UNA tool y pasa sus argumentos correctos. No inventes valores.
+SYSTEM = """Eres un asistente que mapea lenguaje natural a herramientas.
+Normalmente basta con UNA tool; si la pregunta pide varias cosas (p. ej. contactos
+y fechas clave), llama a cada tool necesaria una sola vez. Pasa sus argumentos
+correctos y no inventes valores.
 Si el usuario menciona un código de obra, úsalo como 'obra_code'."""
 
-llm = ChatVertexAI(
-    model=os.getenv("CHAT_MODEL"),
-    max_output_tokens=1000,
-    temperature=0
-).bind_tools(TOOLS)
+# El modelo, las tools y los SDK (Vertex, langchain) se cargan en el primer uso,
+# no al importar: las rutas locales (pre-router, cachés) no pagan esa importación
+_MODEL = None
+# Modelo con tools enlazadas por selección de tools (() = todas)
+_BOUND: Dict[Tuple[str, ...], Any] = {}
+_LLM_CACHE: Optional[ResponseCache] = None
+_LLM_LOCK = threading.Lock()
+
+def get_llm(tool_names: Tuple[str, ...] = ()):
+    """
+    ChatVertexAI con las TOOLS enlazadas, o solo tool_names; el modelo y cada
+    selección de tools se crean una sola vez (thread-safe).
+    """
+    global _MODEL
+    bound = _BOUND.get(tool_names)
+    if bound is None:
+        with _LLM_LOCK:
+            if _MODEL is None:
+                from langchain_google_vertexai import ChatVertexAI
+
+                _MODEL = ChatVertexAI(
+                    model=os.getenv("CHAT_MODEL"),
+                    max_output_tokens=1000,
+                    temperature=0
+                )
+            bound = _BOUND.get(tool_names)
+            if bound is None:
+                from tools.queries import TOOLS, TOOLS_BY_NAME
+
+                tools = [TOOLS_BY_NAME[n] for n in tool_names] if tool_names else TOOLS
+                bound = _BOUND[tool_names] = _MODEL.bind_tools(tools)
+    return bound
+
+def set_chat_model(model: Any = None) -> None:
+    """
+    Sustituye el modelo de chat (p. ej. el falso de graph/chains/replay.py);
+    None vuelve a crear ChatVertexAI en el siguiente uso.
+    """
+    global _MODEL
+    with _LLM_LOCK:
+        _MODEL = model
+        _BOUND.clear()
+
+def set_executor(executor: Any = None) -> None:
+    """
+    Sustituye execute_query / execute_query_async / execute_intents por los de
+    executor (p. ej. el ejecutor grabado de replay.py); None vuelve a Navision.
+    """
+    global execute_query, execute_query_async, execute_intents
+    if executor is None:
+        from database.sql import executor
+    execute_query = executor.execute_query
+    execute_query_async = executor.execute_query_async
+    execute_intents = executor.execute_intents
+
+def get_llm_cache() -> ResponseCache:
+    """Respuestas del LLM en disco; se invalida sola si cambian el modelo, las tools o SYSTEM."""
+    global _LLM_CACHE
+    if _LLM_CACHE is None:
+        with _LLM_LOCK:
+            if _LLM_CACHE is None:
+                from tools.queries import TOOLS
+                _LLM_CACHE = ResponseCache(LLM_CACHE_PATH, fingerprint(os.getenv("CHAT_MODEL"), TOOLS, SYSTEM))
+    return _LLM_CACHE
+
+def warmup() -> float:
+    """
+    Construye el modelo y abre la caché de respuestas por adelantado (p. ej. al
+    arrancar un servicio) para que la primera pregunta no pague ese coste.
+    Devuelve los segundos empleados.
+    """
+    t0 = time.perf_counter()
+    get_llm()
+    if LLM_CACHE_ENABLED:
+        get_llm_cache().stats()
+    return time.perf_counter() - t0
+
+def __getattr__(name: str):
+    # Compatibilidad con "from graph.chains.sql_retrieval_chain import llm"
+    if name == "llm":
+        return get_llm()
+    if name == "LLM_CACHE":
+        return get_llm_cache()
+    if name == "TOOLS":
+        from tools.queries import TOOLS
+        return TOOLS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def run_nl_to_sql(nl_text: str) -> Dict[str, Any]:
-    ai: AIMessage = llm.invoke([("system", SYSTEM), ("user", nl_text)])
+def _messages(nl_text: str):
+    return [("system", SYSTEM), ("user", nl_text)]
 
-    # Debug opcional
-    print(f"Debug - Respuesta del modelo: {ai.content}")
-    print(f"Debug - Tool calls: {ai.tool_calls}")
+def _tools_for(nl_text: str) -> Tuple[str, ...]:
+    """Tools a enlazar para la pregunta según el índice BM25 (() = todas)."""
+    names = select_tools(nl_text)
+    if len(names) == len(get_index().names):
+        return ()
+    logger.debug("Tools enlazadas: %s", ", ".join(names))
+    return names
+
+def _build_prompt(nl_text: str):
+    with tracing.span("prompt") as sp:
+        messages, tools = _messages(nl_text), _tools_for(nl_text)
+        sp.set(tools=list(tools) or "todas")
+    return messages, tools
+
+def _token_usage(ai: "AIMessage") -> Dict[str, int]:
+    # usage_metadata estándar de langchain o, si no viene, el de Vertex en response_metadata
+    usage = getattr(ai, "usage_metadata", None) or {}
+    if not usage:
+        meta = (getattr(ai, "response_metadata", None) or {}).get("usage_metadata") or {}
+        usage = {
+            "input_tokens": meta.get("prompt_token_count"),
+            "output_tokens": meta.get("candidates_token_count"),
+            "total_tokens": meta.get("total_token_count"),
+        }
+    return {k: v for k, v in usage.items() if k in ("input_tokens", "output_tokens", "total_tokens") and v is not None}
+
+def invoke_llm(nl_text: str) -> "AIMessage":
+    """llm.invoke con las tools relevantes, pasando por la caché de respuestas."""
+    messages, tools = _build_prompt(nl_text)
+    with tracing.span("llm", model=os.getenv("CHAT_MODEL")) as sp:
+        ai = get_llm_cache().get(messages, tools) if LLM_CACHE_ENABLED else None
+        sp.set(cache="hit" if ai is not None else "miss")
+        if ai is None:
+            ai = get_llm(tools).invoke(messages)
+            sp.set(**_token_usage(ai))
+            if LLM_CACHE_ENABLED:
+                get_llm_cache().set(messages, ai, tools)
+    return ai
+
+async def ainvoke_llm(nl_text: str) -> "AIMessage":
+    messages, tools = _build_prompt(nl_text)
+    with tracing.span("llm", model=os.getenv("CHAT_MODEL")) as sp:
+        ai = get_llm_cache().get(messages, tools) if LLM_CACHE_ENABLED else None
+        sp.set(cache="hit" if ai is not None else "miss")
+        if ai is None:
+            ai = await get_llm(tools).ainvoke(messages)
+            sp.set(**_token_usage(ai))
+            if LLM_CACHE_ENABLED:
+                get_llm_cache().set(messages, ai, tools)
+    return ai
+
+def _intents_from_ai(ai: "AIMessage") -> List[Dict[str, Any]]:
+    """Un intent por tool call, sin repetidos (misma tool con los mismos argumentos)."""
+    with tracing.span("parse", tool_calls=len(ai.tool_calls)):
+        return _parse_tool_calls(ai)
+
+def _parse_tool_calls(ai: "AIMessage") -> List[Dict[str, Any]]:
+    logger.debug("Respuesta del modelo: %s", ai.content)
+    logger.debug("Tool calls: %s", ai.tool_calls)
 
     if not ai.tool_calls:
         raise ValueError("No se llamó a ninguna herramienta. Revisa el prompt o añade few-shot.")
 
-    call = ai.tool_calls[0]
-    tool_name = call["name"]        # <-- aquí está el nombre de la tool
-    args = call["args"] or {}       # {'obra_code': '855', ...}
+    intents, seen = [], set()
+    for call in ai.tool_calls:
+        tool_name = call["name"]              # <-- aquí está el nombre de la tool
+        args = dict(call["args"] or {})       # {'obra_code': '855', ...}
+
+        # Normalización ligera del parámetro (opcional)
+        if "obra_code" in args and isinstance(args["obra_code"], str):
+            args["obra_code"] = args["obra_code"].strip()
+
+        # Construimos el intent que espera el executor
+        intent = {"query_key": tool_name, **args}
+        key = json.dumps(intent, sort_keys=True, default=str)
+        if key in seen:
+            continue
+        seen.add(key)
+        logger.debug("Intent: %s", intent)
+        intents.append(intent)
+    return intents
+
+def _intent_from_ai(ai: "AIMessage") -> Dict[str, Any]:
+    # Solo la primera tool (compatibilidad)
+    return _intents_from_ai(ai)[0]
+
+def _pre_route(nl_text: str) -> RouteDecision:
+    """
+    Decisión del pre-router: "tool" si está seguro y si no "llm" (también con el
+    router desactivado: sus puntuaciones las usan la caché de decisiones y la
+    especulación). Si rechaza la pregunta lanza ValueError.
+    """
+    decision = route(nl_text)
+    if not ROUTER_ENABLED:
+        return replace(decision, action="llm", tool=None, args={}, reason="pre-router desactivado")
+    if decision.action == "llm":
+        logger.debug("Router: al LLM (%s)", decision.reason)
+        return decision
+    ROUTER_STATS.record(decision.action)
+    stats = ROUTER_STATS.stats()
+    target = decision.tool or "rechazada"
+    logger.debug("Router: %s sin LLM (%s); bypass %.0f%%, ~%.0f ms de LLM ahorrados",
+                 target, decision.reason, stats["bypass_rate"] * 100, stats["saved_ms"])
+    if decision.action == "reject":
+        raise ValueError("La pregunta no corresponde a ninguna herramienta (sin código de obra ni palabras clave).")
+    return decision
+
+def _record_llm(t0: float) -> None:
+    if ROUTER_ENABLED:
+        ROUTER_STATS.record("llm", (time.perf_counter() - t0) * 1000)
+
+def _local_intents(nl_text: str, decision: RouteDecision) -> Optional[List[Dict[str, Any]]]:
+    """Intents sin LLM: pre-router o una decisión anterior para una pregunta parecida."""
+    if decision.action == "tool":
+        return [decision.intent]
+    # Con varias peticiones una decisión parecida perdería alguna: decide el LLM
+    if DECISION_CACHE_ENABLED and not decision.multi_intent:
+        intents = DECISION_CACHE.lookup(nl_text, expected_tool_calls(decision.scores))
+        # Una decisión persistida puede apuntar a una tool que ya no existe
+        if intents is not None and all(i["query_key"] in REGISTRY for i in intents):
+            logger.debug("Caché de decisiones: %s", intents)
+            return intents
+    return None
+
+def _remember(nl_text: str, intents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if DECISION_CACHE_ENABLED and all(i["query_key"] in REGISTRY for i in intents):
+        DECISION_CACHE.store(nl_text, intents)
+    return intents
+
+def _traced_local_intents(nl_text: str) -> Tuple[Optional[List[Dict[str, Any]]], RouteDecision]:
+    with tracing.span("route") as sp:
+        decision = _pre_route(nl_text)
+        intents = _local_intents(nl_text, decision)
+        sp.set(local=intents is not None)
+    return intents, decision
+
+def resolve_intents(nl_text: str) -> List[Dict[str, Any]]:
+    """Intents para el executor (uno por tool): locales si está claro, si no del LLM."""
+    intents, _ = _traced_local_intents(nl_text)
+    if intents is not None:
+        return intents
+    t0 = time.perf_counter()
+    ai = invoke_llm(nl_text)
+    _record_llm(t0)
+    return _remember(nl_text, _intents_from_ai(ai))
+
+async def resolve_intents_async(nl_text: str) -> List[Dict[str, Any]]:
+    intents, _ = _traced_local_intents(nl_text)
+    if intents is not None:
+        return intents
+    t0 = time.perf_counter()
+    ai = await ainvoke_llm(nl_text)
+    _record_llm(t0)
+    return _remember(nl_text, _intents_from_ai(ai))
+
+def resolve_intent(nl_text: str) -> Dict[str, Any]:
+    # Solo la primera tool (compatibilidad)
+    return resolve_intents(nl_text)[0]
+
+async def resolve_intent_async(nl_text: str) -> Dict[str, Any]:
+    return (await resolve_intents_async(nl_text))[0]
+
+def _error(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+def combine_results(intents: List[Dict[str, Any]], outcomes: List[Any]) -> Dict[str, Any]:
+    """Resultado de varias tools: una entrada por llamada con su resultado o su error."""
+    results = []
+    for intent, outcome in zip(intents, outcomes):
+        entry = {"tool": intent["query_key"], "args": {k: v for k, v in intent.items() if k != "query_key"}}
+        if isinstance(outcome, BaseException):
+            entry["error"] = _error(outcome)
+        else:
+            entry["result"] = outcome
+        results.append(entry)
+    return {"tool_calls": len(results), "errors": sum("error" in r for r in results), "results": results}
+
+def _resolve_speculative(nl_text: str):
+    """
+    resolve_intents lanzando en paralelo al LLM la query que predice el
+    pre-router. Devuelve los intents y la especulación si el modelo la
+    confirmó (None si no hubo o se descartó).
+    """
+    intents, decision = _traced_local_intents(nl_text)
+    if intents is not None:
+        return intents, None
+    guess = predict_intent(nl_text, decision)
+    if guess is None:
+        t0 = time.perf_counter()
+        ai = invoke_llm(nl_text)
+        _record_llm(t0)
+        return _remember(nl_text, _intents_from_ai(ai)), None
+
+    spec = Speculation(guess, tracing.with_context(execute_query), get_worker_pool())
+    with tracing.span("speculate", tool=guess["query_key"]) as sp:
+        try:
+            t0 = time.perf_counter()
+            ai = invoke_llm(nl_text)
+            llm_done = time.perf_counter()
+            _record_llm(t0)
+            intents = _remember(nl_text, _intents_from_ai(ai))
+        except BaseException:
+            spec.discard()
+            raise
+        if not any(spec.matches(i) for i in intents):
+            spec.discard()
+            spec = None
+        sp.set(hit=spec is not None)
+    stats = SPECULATION_STATS.stats()
+    logger.debug("Especulación %s: %s; aciertos %.0f%%, ~%.0f ms de SQL solapados con el LLM",
+                 "acertada" if spec else "descartada", guess, stats["hit_rate"] * 100, stats["saved_ms"])
+    return intents, (spec, llm_done) if spec else None
+
+def run_nl_to_sql(
+    nl_text: str, request_id: Optional[str] = None, speculative: Optional[bool] = None
+) -> Dict[str, Any]:
+    """
+    Con una tool devuelve el resultado de execute_query tal cual. Si el modelo
+    llama a varias, se ejecutan a la vez y se devuelve combine_results: el
+    fallo de una tool no impide devolver las demás.
+    request_id identifica la petición en logs y trazas (se genera si no se pasa).
+    speculative (por defecto SPECULATIVE_SQL) ejecuta la query probable
+    mientras responde el LLM (graph/chains/speculation.py).
+    """
+    speculative = SPECULATIVE_ENABLED if speculative is None else speculative
+    with tracing.request(request_id), tracing.span("run_nl_to_sql", question=nl_text):
+        if not speculative:
+            intents, kept = resolve_intents(nl_text), None
+        else:
+            intents, kept = _resolve_speculative(nl_text)
+        if kept is None:
+            if len(intents) == 1:
+                return execute_query(intents[0])    # usa navision por defecto (qmark)
+            return combine_results(intents, execute_intents(intents))
+
+        spec, llm_done = kept
+        if len(intents) == 1:
+            return spec.keep(llm_done)
+        # Varias tools: la especulada ya está en curso, el resto se ejecuta ahora
+        pos = next(i for i, intent in enumerate(intents) if spec.matches(intent))
+        outcomes = execute_intents(intents[:pos] + intents[pos + 1:])
+        try:
+            outcome = spec.keep(llm_done)
+        except Exception as e:
+            outcome = e
+        return combine_results(intents, outcomes[:pos] + [outcome] + outcomes[pos:])
+
+async def run_nl_to_sql_async(
+    nl_text: str, timeout: Optional[float] = None, request_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Igual que run_nl_to_sql sin bloquear el event loop: el LLM se llama con
+    ainvoke y la query corre en el pool de hilos del executor.
+    timeout (segundos) limita la petición completa.
+    """
+    async def _run() -> Dict[str, Any]:
+        with tracing.request(request_id), tracing.span("run_nl_to_sql", question=nl_text):
+            intents = await resolve_intents_async(nl_text)
+            if len(intents) == 1:
+                return await execute_query_async(intents[0])
+            outcomes = await asyncio.gather(*(execute_query_async(i) for i in intents), return_exceptions=True)
+            return combine_results(intents, outcomes)
+
+    return await asyncio.wait_for(_run(), timeout)
+
+def resolve_intents_batch(questions: List[str], max_concurrency: int = 8) -> List[Any]:
+    """
+    Intents de muchas preguntas: primero por las vías locales (pre-router,
+    cachés) y las que quedan van al LLM con RunnableLambda.batch, que hace un
+    invoke por pregunta (cada una con sus tools) en un pool de hilos, como
+    mucho max_concurrency a la vez. Las preguntas repetidas van una vez al
+    LLM. Las estadísticas del router cuentan cada pregunta como lo haría
+    run_nl_to_sql. Devuelve, en orden, la lista de intents o la excepción de
+    cada pregunta.
+    """
+    intents: List[Any] = [None] * len(questions)
+    pending: Dict[str, List[int]] = {}  # pregunta normalizada -> posiciones
+    tools_of: Dict[str, Tuple[str, ...]] = {}
+    for idx, q in enumerate(questions):
+        try:
+            local = _local_intents(q, _pre_route(q))
+        except ValueError as e:
+            intents[idx] = e
+            continue
+        if local is not None:
+            intents[idx] = local
+        else:
+            text = " ".join(q.split())
+            if text not in tools_of:
+                tools_of[text] = _tools_for(text)
+            t0 = time.perf_counter()
+            ai = get_llm_cache().get(_messages(q), tools_of[text]) if LLM_CACHE_ENABLED else None
+            if ai is not None:
+                _record_llm(t0)
+                try:
+                    intents[idx] = _remember(q, _intents_from_ai(ai))
+                except ValueError as e:
+                    intents[idx] = e
+                continue
+            pending.setdefault(text, []).append(idx)
+
+    if pending:
+        from langchain_core.runnables import RunnableLambda
+
+        texts = list(pending)
+        def _call(text: str) -> "AIMessage":
+            t0 = time.perf_counter()
+            with tracing.span("llm", model=os.getenv("CHAT_MODEL"), cache="miss") as sp:
+                ai = get_llm(tools_of[text]).invoke(_messages(text))
+                sp.set(**_token_usage(ai))
+            for _ in pending[text]:
+                _record_llm(t0)
+            return ai
 
-    # Normalización ligera del parámetro (opcional)
-    if "obra_code" in args and isinstance(args["obra_code"], str):
-        args["obra_code"] = args["obra_code"].strip()
+        # Cada pregunta lleva sus tools, así que no vale llm.batch (mismas tools para
+        # todas): RunnableLambda.batch reparte la concurrencia entre los invoke
+        call = RunnableLambda(_call)
+        answers = call.batch(texts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        for text, ai in zip(texts, answers):
+            if not isinstance(ai, Exception):
+                if LLM_CACHE_ENABLED:
+                    get_llm_cache().set(_messages(text), ai, tools_of[text])
+                try:
+                    ai = _remember(text, _intents_from_ai(ai))
+                except ValueError as e:
+                    ai = e
+            for idx in pending[text]:
+                intents[idx] = [dict(i) for i in ai] if isinstance(ai, list) else ai
+    return intents
 
-    # Construimos el intent que espera el executor
-    intent = {"query_key": tool_name, **args}
-    print(f"Debug - Intent: {intent}")
+def run_nl_to_sql_batch(questions: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+    """
+    run_nl_to_sql para muchas preguntas (evaluaciones, cargas masivas): las
+    llamadas al LLM van en paralelo (resolve_intents_batch) y los intents de todas se ejecutan agrupados y en paralelo
+    con execute_intents. Devuelve, en el orden de entrada,
+    {"question", "intent", "result", "error"}; un fallo solo afecta a su
+    pregunta. Si el modelo llamó a varias tools, "intent" es la lista y
+    "result" el de combine_results.
+    """
+    t0 = time.perf_counter()
+    with tracing.request(), tracing.span("run_nl_to_sql_batch", questions=len(questions)):
+        intents = resolve_intents_batch(questions, max_concurrency)
+        flat: List[Dict[str, Any]] = []
+        spans: Dict[int, range] = {}  # pregunta -> posiciones en flat
+        for i, qi in enumerate(intents):
+            if isinstance(qi, list):
+                spans[i] = range(len(flat), len(flat) + len(qi))
+                flat.extend(qi)
+        executed = execute_intents(flat)
 
-    return execute_query(intent)    # usa navision por defecto (qmark)
+    items = []
+    for i, (q, qi) in enumerate(zip(questions, intents)):
+        item = {"question": q, "intent": None, "result": None, "error": None}
+        if i not in spans:
+            item["error"] = _error(qi)
+        elif len(qi) == 1:
+            item["intent"] = qi[0]
+            outcome = executed[spans[i][0]]
+            if isinstance(outcome, BaseException):
+                item["error"] = _error(outcome)
+            else:
+                item["result"] = outcome
+        else:
+            item["intent"] = qi
+            item["result"] = combine_results(qi, [executed[j] for j in spans[i]])
+        items.append(item)
+    errors = sum(1 for it in items if it["error"])
+    logger.info("Lote: %d preguntas, %d con error, %.2f s", len(questions), errors, time.perf_counter() - t0)
+    return items
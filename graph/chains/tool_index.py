@@ -0,0 +1,207 @@
+# graph/chains/tool_index.py
+"""
+Índice local (BM25) sobre las tools del REGISTRY para enlazar al LLM solo las
+k más relevantes para cada pregunta: con muchas tools, mandar todos los
+esquemas en cada llamada cuesta tokens y latencia.
+
+Cada tool se indexa con su nombre, su description, las palabras clave del
+pre-router (tools.routing, repetidas según su peso) y los alias de columna de
+su SQL. Si el índice no distingue bien (ningún término conocido, o la segunda
+tool puntúa casi como la primera) se enlazan todas: un recorte dudoso puede
+dejar fuera la tool correcta y el LLM ya no podría elegirla.
+
+La precisión se mide con dos juegos: los examples del REGISTRY (las palabras
+clave se escribieron mirándolos, así que sobreestiman) y HELD_OUT_CASES,
+preguntas redactadas aparte que no se usan para ajustar el índice.
+
+Informe de precisión y ahorro de tokens (desde la raíz del proyecto):
+    python -m graph.chains.tool_index --k 3
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from database.sql.registry import REGISTRY, QuerySpec, get_sql
+from graph.chains.intent_router import normalize
+from tools.routing import ROUTING_KEYWORDS
+
+# Tools que se enlazan por pregunta (0 = todas, sin recuperación)
+TOOL_RETRIEVAL_TOP_K = int(os.environ.get("TOOL_RETRIEVAL_TOP_K", "3"))
+# Ventaja mínima de la primera tool sobre la segunda (fracción de su puntuación)
+# para recortar; por debajo se enlazan todas
+TOOL_RETRIEVAL_MIN_MARGIN = float(os.environ.get("TOOL_RETRIEVAL_MIN_MARGIN", "0.25"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STOPWORDS = frozenset(
+    "a al de del el en la las lo los me mi por para que se su sus un una y o con "
+    "dame dime cual cuales es son esta obra obras devuelve codigo".split()
+)
+_ALIAS = re.compile(r"\bAS\s+\[?(\w+)\]?", re.IGNORECASE)
+
+# Preguntas de evaluación redactadas sin mirar las palabras clave ni los examples
+HELD_OUT_CASES = [
+    ("¿a quién llamo si tengo un problema en la obra 1204?", "contactos_obra_por_codigo"),
+    ("necesito el número del técnico de la 877", "contactos_obra_por_codigo"),
+    ("qué personas están asignadas a la obra 930", "contactos_obra_por_codigo"),
+    ("¿cuándo se entregó definitivamente la obra 640?", "cronograma_hitos_por_codigo"),
+    ("¿en qué día empezaron los trabajos de la 713?", "cronograma_hitos_por_codigo"),
+    ("calendario de la obra 455", "cronograma_hitos_por_codigo"),
+    ("¿vamos por encima de lo previsto en costes en la 522?", "kpir_por_codigo"),
+    ("indicador de desvío de la obra 318", "kpir_por_codigo"),
+    ("¿cuánto se ha desviado el coste real frente al presupuestado en la 990?", "kpir_por_codigo"),
+    ("importe de contrato de la 1102", "precio_obra_por_codigo"),
+    ("¿por cuánto se adjudicó la obra 604 con impuestos?", "precio_obra_por_codigo"),
+    ("valor de la obra 733", "precio_obra_por_codigo"),
+    ("¿estamos perdiendo dinero en la 845?", "margen_obra_por_codigo"),
+    ("diferencia entre lo vendido y lo gastado en la 212", "margen_obra_por_codigo"),
+    ("¿es rentable la obra 377?", "margen_obra_por_codigo"),
+    ("¿cuánto hemos facturado ya en la 419?", "certificacion_obra_por_codigo"),
+    ("importe certificado hasta hoy de la 588", "certificacion_obra_por_codigo"),
+    ("último movimiento de proyecto de la obra 761", "certificacion_obra_por_codigo"),
+    ("gráfico de producción mensual de la 903", "curva_s_por_codigo"),
+    ("¿cómo ha ido avanzando la producción en la 266?", "curva_s_por_codigo"),
+    ("producido acumulado por fecha de la obra 150", "curva_s_por_codigo"),
+    ("¿cuánto tiempo tenía la obra 489 para terminarse?", "plazo_obra_por_codigo"),
+    ("¿va con retraso la 1033?", "plazo_obra_por_codigo"),
+    ("duración prevista de la obra 674", "plazo_obra_por_codigo"),
+]
+
+def _stem(token: str) -> str:
+    # Raíz burda: sin plural ni vocal final y a 6 letras ("firmó"/"firma", "certificado"/"certificación")
+    if len(token) > 4 and token.endswith("s"):
+        token = token[:-1]
+    if len(token) > 3 and token[-1] in "aeiou":
+        token = token[:-1]
+    return token[:6]
+
+def tokenize(text: str) -> List[str]:
+    """Raíces de las palabras sin tildes, sin palabras vacías ni números."""
+    return [
+        _stem(t) for t in re.findall(r"[a-z]\w+", normalize(text).replace("_", " "))
+        if t not in _STOPWORDS
+    ]
+
+def tool_document(name: str, spec: QuerySpec) -> List[str]:
+    """Términos con los que se indexa una tool."""
+    text = [name, spec.description]
+    text += [kw for kw, weight in ROUTING_KEYWORDS.get(name, {}).items() for _ in range(int(weight))]
+    text += _ALIAS.findall(get_sql(name))
+    return tokenize(" ".join(text))
+
+class BM25Index:
+    """BM25 clásico sobre un documento (lista de términos) por tool."""
+
+    def __init__(self, docs: Dict[str, List[str]], k1: float = BM25_K1, b: float = BM25_B):
+        self.names = list(docs)
+        self.k1 = k1
+        self.b = b
+        self._tf = {name: Counter(terms) for name, terms in docs.items()}
+        self._len = {name: len(terms) for name, terms in docs.items()}
+        self._avgdl = (sum(self._len.values()) / len(docs)) if docs else 0.0
+        df = Counter(t for terms in docs.values() for t in set(terms))
+        n = len(docs)
+        self._idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        """(tool, puntuación) de mayor a menor; a igualdad, en el orden del REGISTRY."""
+        terms = set(tokenize(text))
+        result = []
+        for name in self.names:
+            tf, dl, score = self._tf[name], self._len[name], 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    score += self._idf[t] * f * (self.k1 + 1) / (
+                        f + self.k1 * (1 - self.b + self.b * dl / self._avgdl)
+                    )
+            result.append((name, score))
+        return sorted(result, key=lambda x: x[1], reverse=True)
+
+def build_index(registry: Dict[str, QuerySpec]) -> BM25Index:
+    return BM25Index({name: tool_document(name, spec) for name, spec in registry.items() if spec.description})
+
+_INDEX: Optional[BM25Index] = None
+
+def get_index() -> BM25Index:
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = build_index(REGISTRY)
+    return _INDEX
+
+def select_tools(question: str, k: Optional[int] = None) -> Tuple[str, ...]:
+    """
+    Nombres de las k tools más relevantes, en el orden del REGISTRY (así una
+    misma selección da siempre el mismo prompt). Todas si k <= 0, si hay k o
+    menos tools, si ningún término de la pregunta aparece en el índice o si la
+    primera no saca a la segunda TOOL_RETRIEVAL_MIN_MARGIN de ventaja.
+    """
+    k = TOOL_RETRIEVAL_TOP_K if k is None else k
+    index = get_index()
+    ranked = index.scores(question)
+    if k <= 0 or k >= len(ranked) or not ranked[0][1]:
+        return tuple(index.names)
+    if ranked[0][1] - ranked[1][1] < TOOL_RETRIEVAL_MIN_MARGIN * ranked[0][1]:
+        return tuple(index.names)
+    top = {name for name, _ in ranked[:k]}
+    return tuple(name for name in index.names if name in top)
+
+# --- informe ---
+def _tool_tokens() -> Dict[str, int]:
+    # Estimación: ~4 caracteres por token del esquema JSON que recibe el modelo
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    from tools.queries import TOOLS
+
+    return {t.name: len(json.dumps(convert_to_openai_tool(t), ensure_ascii=False)) // 4 for t in TOOLS}
+
+def evaluate(k: int, examples: Sequence[Tuple[str, str]]) -> Dict[str, object]:
+    """
+    acc_at_1: la primera del ranking es la esperada. acc_at_k: la esperada
+    está entre las tools enlazadas (también cuando se enlazan todas, que
+    cuenta aparte en fallback).
+    """
+    index = get_index()
+    at1 = atk = fallback = 0
+    misses = []
+    for question, expected in examples:
+        ranked = [name for name, _ in index.scores(question)]
+        selected = select_tools(question, k)
+        at1 += ranked[0] == expected
+        fallback += len(selected) == len(index.names)
+        if expected in selected:
+            atk += 1
+        else:
+            misses.append((question, expected, ranked[:k]))
+    n = len(examples) or 1
+    return {"examples": len(examples), "acc_at_1": at1 / n, "acc_at_k": atk / n,
+            "fallback": fallback / n, "misses": misses}
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión de la recuperación de tools y ahorro de tokens")
+    parser.add_argument("--k", type=int, default=TOOL_RETRIEVAL_TOP_K, help="Tools enlazadas por pregunta")
+    args = parser.parse_args()
+
+    examples = [(q, name) for name, spec in REGISTRY.items() for q in spec.examples]
+    for label, cases in (("de ejemplo del REGISTRY (en muestra)", examples),
+                         ("de HELD_OUT_CASES (fuera de muestra)", HELD_OUT_CASES)):
+        report = evaluate(args.k, cases)
+        print(f"🎯 {report['examples']} preguntas {label}: acierto@1 {report['acc_at_1']:.0%}, "
+              f"acierto@{args.k} {report['acc_at_k']:.0%}, todas las tools en el {report['fallback']:.0%}")
+        for question, expected, got in report["misses"]:
+            print(f"   ❌ {question!r}: esperaba {expected}, top-{args.k} {got}")
+
+    tokens = _tool_tokens()
+    full = sum(tokens.values())
+    per_question = [sum(tokens[n] for n in select_tools(q, args.k)) for q, _ in examples + HELD_OUT_CASES]
+    avg = sum(per_question) / len(per_question) if per_question else full
+    saved = 1 - avg / full if full else 0.0
+    print(f"🪙 Esquemas de tools por llamada: {full} tokens con todas ({len(tokens)}), "
+          f"{avg:.0f} de media con top-{args.k} ({saved:.0%} menos)")
+
+if __name__ == "__main__":
+    main()
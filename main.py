@@ -1,7 +1,9 @@
 # main.py
+from database.sql.tracing import configure_logging
 from graph.chains.sql_retrieval_chain import run_nl_to_sql
 
 if __name__ == "__main__":
+    configure_logging()
     # Ejemplos
     print(">> Contactos por obra")
     res1 = run_nl_to_sql("Dame cargo, nombre y móvil de la obra 855")
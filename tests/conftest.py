@@ -0,0 +1,32 @@
+# tests/conftest.py
+"""
+Fixtures comunes: una BD Navision sintética en SQLite (benchmarks/standin.py)
+con el pool apuntando a ella y las copias locales en un directorio temporal.
+
+Uso (desde la raíz del proyecto):
+    python -m pytest -q
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from database.sql.benchmarks.standin import build_standin_db, isolate_snapshots, sqlite_factory
+from database.sql.navision_connector import configure_pool
+from database.sql.result_cache import RESULT_CACHE
+
+@pytest.fixture(scope="session")
+def standin_db(tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp("navision") / "standin.db"
+    return build_standin_db(str(path), rows=5_000, n_obras=50)
+
+@pytest.fixture
+def navision(standin_db):
+    """Pool contra la BD sintética; devuelve su ruta para montar otras factorías."""
+    isolate_snapshots()
+    RESULT_CACHE.invalidate()
+    configure_pool(sqlite_factory(standin_db), min_size=1, max_size=4)
+    yield standin_db
+    RESULT_CACHE.invalidate()
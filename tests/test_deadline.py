@@ -0,0 +1,40 @@
+# tests/test_deadline.py
+import threading
+
+from database.sql.deadline import _WATCHDOG, Deadline
+
+def test_fires_cancel_fn_when_expired():
+    fired = threading.Event()
+    deadline = Deadline(0.05)
+    deadline.arm(fired.set)
+    assert fired.wait(1)
+    assert deadline.fired and deadline.expired()
+
+def test_disarm_removes_entry_from_watchdog():
+    fired = threading.Event()
+    deadlines = [Deadline(60) for _ in range(200)]
+    for d in deadlines:
+        d.arm(fired.set)
+    for d in deadlines:
+        d.disarm()
+    with _WATCHDOG._cond:
+        live = [e for e in _WATCHDOG._heap if e[2] is not None]
+        assert not live
+        # Las entradas muertas no se quedan hasta su vencimiento
+        assert len(_WATCHDOG._heap) < len(deadlines)
+    assert not fired.is_set()
+
+def test_cancel_fires_armed_deadline():
+    fired = threading.Event()
+    deadline = Deadline()
+    deadline.arm(fired.set)
+    deadline.cancel()
+    assert fired.is_set() and deadline.cancelled
+
+def test_rearming_does_not_duplicate_entries():
+    deadline = Deadline(60)
+    deadline.arm(lambda: None)
+    deadline.arm(lambda: None)
+    with _WATCHDOG._cond:
+        assert sum(e[2] is deadline for e in _WATCHDOG._heap) == 1
+    deadline.disarm()
@@ -0,0 +1,65 @@
+# tests/test_executor.py
+import threading
+import time
+
+import pytest
+
+from database.sql import executor, slow_query_log
+from database.sql.benchmarks.standin import sleepy_factory
+from database.sql.deadline import Deadline
+from database.sql.executor import coalesce_stats, execute_query
+from database.sql.navision_connector import configure_pool
+
+def test_coalesced_callers_keep_their_own_timeout(navision):
+    # La primera llamada tiene un plazo corto: al vencer deja de esperar ella
+    # sola, sin cancelar la sentencia que espera la segunda
+    configure_pool(sleepy_factory(navision, 400), min_size=1, max_size=2)
+    intent = {"query_key": "contactos_obra_por_codigo", "obra_code": "7"}
+    before = coalesce_stats()
+    outcome = {}
+
+    def call(name, timeout):
+        t0 = time.perf_counter()
+        try:
+            outcome[name] = execute_query(intent, use_cache=False, timeout=timeout)
+        except TimeoutError as e:
+            outcome[name] = e
+        outcome[name + "_s"] = time.perf_counter() - t0
+
+    short = threading.Thread(target=call, args=("short", 0.1))
+    short.start()
+    time.sleep(0.02)
+    long = threading.Thread(target=call, args=("long", 5))
+    long.start()
+    short.join()
+    long.join()
+
+    assert isinstance(outcome["short"], TimeoutError)
+    assert outcome["short_s"] < 0.3
+    assert outcome["long"]["rowcount"] > 0
+    after = coalesce_stats()
+    assert after["executed"] - before["executed"] == 1
+    assert after["collapsed"] - before["collapsed"] == 1
+
+def test_plan_capture_is_bounded_by_the_deadline(monkeypatch):
+    class Conn:
+        timeout = 0
+
+    seen = []
+    monkeypatch.setattr(slow_query_log, "capture_plan", lambda conn, sql, args: seen.append(conn.timeout) or "<plan/>")
+    conn = Conn()
+    assert executor._capture_plan(conn, "SELECT 1", (), Deadline(2.5)) == "<plan/>"
+    assert seen == [3] and conn.timeout == 0
+    assert executor._capture_plan(conn, "SELECT 1", (), Deadline(0)) is None
+    assert len(seen) == 1
+
+def test_iter_query_matches_execute_query(navision):
+    intent = {"query_key": "contactos_obra_por_codigo", "obra_code": "9"}
+    assert list(executor.iter_query(intent, arraysize=2)) == execute_query(intent, use_cache=False)["rows"]
+
+def test_iter_query_is_cancelled_at_its_deadline(navision):
+    intent = {"query_key": "curva_s_por_codigo", "obra_code": "3"}
+    rows = executor.iter_query(intent, arraysize=1, timeout=0.2)
+    with pytest.raises(TimeoutError):
+        for _ in rows:
+            time.sleep(0.1)  # consumidor lento
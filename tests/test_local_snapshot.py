@@ -0,0 +1,72 @@
+# tests/test_local_snapshot.py
+import shutil
+import sqlite3
+
+import pytest
+
+from database.sql.benchmarks.standin import sqlite_factory
+from database.sql.local_snapshot import TableSnapshot
+from database.sql.navision_connector import configure_pool
+
+@pytest.fixture
+def remote(standin_db, tmp_path):
+    # Copia propia de la BD sintética: estas pruebas la modifican
+    path = str(tmp_path / "remote.db")
+    shutil.copy(standin_db, path)
+    configure_pool(sqlite_factory(path), min_size=1, max_size=2)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def snapshot(tmp_path):
+    snap = TableSnapshot("obras_test", table="obras ayu", key_column="No_", modified_column="Last Date Modified")
+    snap.path = str(tmp_path / "obras_test.sqlite")
+    return snap
+
+def _local(snapshot, sql, *args):
+    with snapshot.connection() as conn:
+        return conn.execute(sql, args).fetchall()
+
+def test_first_sync_is_full(remote, snapshot):
+    total = remote.execute("SELECT COUNT(*) FROM [obras ayu]").fetchone()[0]
+    stats = snapshot.refresh()
+    assert stats["full"] and stats["fetched"] == stats["rows"] == total
+    assert snapshot.is_fresh()
+
+def test_incremental_sync_only_brings_changes(remote, snapshot):
+    snapshot.refresh()
+    watermark = snapshot.meta()["watermark"]
+    remote.execute("UPDATE [obras ayu] SET Description = 'renombrada', [Last Date Modified] = '2031-01-01' "
+                   "WHERE No_ = '5'")
+    remote.execute("INSERT INTO [obras ayu] (No_, Description, [Last Date Modified]) "
+                   "VALUES ('9999', 'nueva', '2031-01-02')")
+    remote.commit()
+
+    stats = snapshot.refresh(full=False)
+    assert not stats["full"]
+    # Solo lo modificado desde la marca de agua (>=, así que también lo de ese mismo día)
+    same_day = remote.execute("SELECT COUNT(*) FROM [obras ayu] WHERE [Last Date Modified] >= ?",
+                              (watermark,)).fetchone()[0]
+    assert stats["fetched"] == same_day < stats["rows"]
+    assert stats["watermark"] == "2031-01-02"
+    assert _local(snapshot, "SELECT Description FROM [obras ayu] WHERE No_ = '5'") == [("renombrada",)]
+    assert _local(snapshot, "SELECT Description FROM [obras ayu] WHERE No_ = '9999'") == [("nueva",)]
+
+def test_only_full_sync_picks_up_deletions(remote, snapshot):
+    snapshot.refresh()
+    remote.execute("DELETE FROM [obras ayu] WHERE No_ = '7'")
+    remote.commit()
+
+    snapshot.refresh(full=False)
+    assert _local(snapshot, "SELECT COUNT(*) FROM [obras ayu] WHERE No_ = '7'") == [(1,)]
+    stats = snapshot.refresh(full=True)
+    assert stats["full"]
+    assert _local(snapshot, "SELECT COUNT(*) FROM [obras ayu] WHERE No_ = '7'") == [(0,)]
+
+def test_local_reads_ignore_case_and_trailing_spaces(remote, snapshot):
+    remote.execute("INSERT INTO [obras ayu] (No_, Description, [Last Date Modified]) "
+                   "VALUES ('AB12', 'texto', '2020-01-01')")
+    remote.commit()
+    snapshot.refresh()
+    assert _local(snapshot, "SELECT Description FROM [obras ayu] WHERE No_ = ?", "ab12 ") == [("texto",)]
@@ -0,0 +1,65 @@
+# tests/test_pagination.py
+import sqlite3
+
+import pytest
+
+from database.sql.executor import execute_query
+from database.sql.pagination import decode_token, encode_token, keyset_sql, limit_sql, sqlite_sql
+
+def _all_pages(intent):
+    rows, token, pages = [], None, 0
+    while True:
+        page = execute_query({**intent, "page_token": token} if token else intent, use_cache=False)
+        rows += page["rows"]
+        pages += 1
+        token = page["next_page_token"]
+        if token is None:
+            return rows, pages
+
+def test_page_token_round_trip(navision):
+    intent = {"query_key": "curva_s_por_codigo", "obra_code": "3"}
+    full = execute_query({**intent, "page_size": 100_000}, use_cache=False)
+    assert not full["truncated"] and full["rowcount"] > 10
+
+    rows, pages = _all_pages({**intent, "page_size": 7})
+    assert rows == full["rows"]
+    assert pages == -(-len(rows) // 7)
+
+def test_tampered_token_is_rejected(navision):
+    intent = {"query_key": "curva_s_por_codigo", "obra_code": "3", "page_size": 5}
+    token = execute_query(intent, use_cache=False)["next_page_token"]
+    # Un token de otra obra no vale para esta
+    with pytest.raises(ValueError, match="no corresponde"):
+        execute_query({**intent, "obra_code": "4", "page_token": token}, use_cache=False)
+    with pytest.raises(ValueError, match="inválido"):
+        execute_query({**intent, "page_token": token[:-6] + "!!"}, use_cache=False)
+
+def test_token_keeps_value_type():
+    token = encode_token("q", ("855",), 12)
+    assert decode_token(token, "q", ("855",)) == 12
+    with pytest.raises(ValueError):
+        decode_token(token, "q", ("856",))
+
+def test_limit_is_applied_by_the_server():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (k INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(100)])
+    inner = "SELECT k FROM t WHERE k >= ?"
+    assert "FETCH NEXT ? ROWS ONLY" in keyset_sql(inner, "k", True, limited=True)
+    rows = conn.execute(sqlite_sql(keyset_sql(inner, "k", True, limited=True)), (10, 50, 6)).fetchall()
+    assert rows == [(k,) for k in range(51, 57)]
+    assert len(conn.execute(sqlite_sql(limit_sql(inner)), (0, 3)).fetchall()) == 3
+    with pytest.raises(ValueError):
+        limit_sql(inner + " ORDER BY k")
+
+def test_columnar_pages_match_rows(navision):
+    pytest.importorskip("numpy")
+    intent = {"query_key": "curva_s_por_codigo", "obra_code": "3", "page_size": 4}
+    rows = execute_query(intent, use_cache=False)
+    cols = execute_query(intent, format="columnar", coalesce=False)
+    assert cols["rowcount"] == rows["rowcount"] == 4
+    assert cols["truncated"] and cols["next_page_token"] == rows["next_page_token"]
+    assert list(cols["data"]["t"]) == [r["t"] for r in rows["rows"]]
+
+    following = execute_query({**intent, "page_token": cols["next_page_token"]}, format="columnar")
+    assert following["data"]["t"][0] > cols["data"]["t"][-1]
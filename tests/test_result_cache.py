@@ -0,0 +1,40 @@
+# tests/test_result_cache.py
+import time
+
+from database.sql.result_cache import ResultCache
+
+def test_entries_expire_after_their_ttl():
+    cache = ResultCache()
+    cache.set("a", {"rows": []}, ttl=0.05)
+    assert cache.get("a") == {"rows": []}
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_least_recently_used_is_evicted_first():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")  # "b" pasa a ser la menos usada
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_budget_and_oversized_results():
+    cache = ResultCache(max_bytes=2_000)
+    cache.set("big", "x" * 5_000, ttl=60)
+    assert cache.get("big") is None and cache.stats()["rejected"] == 1
+    for i in range(10):
+        cache.set(i, "y" * 500, ttl=60)
+    assert cache.stats()["bytes"] <= 2_000
+    assert cache.get(9) is not None and cache.get(0) is None
+
+def test_zero_ttl_is_not_cached_and_invalidate_by_query():
+    cache = ResultCache()
+    cache.set(("q1", ("855",)), 1, ttl=0)
+    assert cache.get(("q1", ("855",))) is None
+    cache.set(("q1", ("855",)), 1, ttl=60)
+    cache.set(("q2", ("855",)), 2, ttl=60)
+    cache.invalidate("q1")
+    assert cache.get(("q1", ("855",))) is None and cache.get(("q2", ("855",))) == 2
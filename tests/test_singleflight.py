@@ -0,0 +1,81 @@
+# tests/test_singleflight.py
+import threading
+import time
+
+import pytest
+
+from database.sql.deadline import Deadline
+from database.sql.singleflight import SingleFlight
+
+def _concurrently(n, fn):
+    out = [None] * n
+    def run(i):
+        try:
+            out[i] = fn()
+        except Exception as e:
+            out[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+@pytest.mark.parametrize("method", ["do", "share"])
+def test_identical_calls_share_one_execution(method):
+    flight, calls = SingleFlight(), []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"rows": [1, 2]}
+
+    out = _concurrently(5, lambda: getattr(flight, method)("k", work))
+    assert len(calls) == 1
+    assert all(result == {"rows": [1, 2]} for result, _ in out)
+    assert sorted(shared for _, shared in out) == [False, True, True, True, True]
+    assert flight.stats() == {"executed": 1, "collapsed": 4, "in_flight": 0}
+
+@pytest.mark.parametrize("method", ["do", "share"])
+def test_errors_reach_every_waiter(method):
+    flight = SingleFlight()
+
+    def work():
+        time.sleep(0.1)
+        raise ValueError("Navision caído")
+
+    out = _concurrently(3, lambda: getattr(flight, method)("k", work))
+    assert all(isinstance(e, ValueError) for e in out)
+    # El siguiente intento vuelve a ejecutar
+    assert flight.do("k", lambda: 1) == (1, False)
+
+def test_last_waiter_leaving_abandons_the_work():
+    flight, abandoned = SingleFlight(), threading.Event()
+    release = threading.Event()
+    with pytest.raises(TimeoutError):
+        flight.share("k", release.wait, deadline=Deadline(0.05), on_abandon=abandoned.set)
+    assert abandoned.is_set()
+    assert flight.stats()["in_flight"] == 0
+    release.set()
+
+def test_cancelled_waiter_does_not_abandon_others():
+    flight, abandoned = SingleFlight(), threading.Event()
+    short = Deadline()
+    out = {}
+
+    def slow():
+        time.sleep(0.2)
+        return "ok"
+
+    def patient():
+        out["patient"] = flight.share("k", slow, deadline=Deadline(5), on_abandon=abandoned.set)
+
+    t = threading.Thread(target=patient)
+    t.start()
+    time.sleep(0.02)
+    threading.Timer(0.05, short.cancel).start()
+    with pytest.raises(TimeoutError):
+        flight.share("k", slow, deadline=short, on_abandon=abandoned.set)
+    t.join()
+    assert out["patient"] == ("ok", False)
+    assert not abandoned.is_set()
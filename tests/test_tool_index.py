@@ -0,0 +1,11 @@
+# tests/test_tool_index.py
+from graph.chains.tool_index import HELD_OUT_CASES, evaluate, get_index, select_tools
+
+def test_held_out_questions_keep_the_right_tool():
+    report = evaluate(3, HELD_OUT_CASES)
+    assert report["acc_at_k"] >= 0.9, report["misses"]
+
+def test_ambiguous_question_binds_every_tool():
+    # "contrato" aparece en varias tools con puntuaciones parecidas
+    assert len(select_tools("importe de contrato de la 1102", 3)) == len(get_index().names)
+    assert len(select_tools("curva S de la obra 855", 3)) == 3
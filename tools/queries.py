@@ -1,22 +1,33 @@
 # tools/queries.py
-from pydantic import BaseModel, Field
-from langchain_core.tools import tool
-
-class ObraCodeArgs(BaseModel):
-    obra_code: str = Field(..., description="Código de obra (OBRA_CODE)")
-
-@tool("contactos_obra_por_codigo", args_schema=ObraCodeArgs)
-def t_contactos_obra_por_codigo(obra_code: str):
-    """
-    Devuelve contactos (cargo_id, nombre, movil) para una obra.
-    """
-    return {"query_key": "contactos_obra_por_codigo", "obra_code": obra_code.strip()}
-
-@tool("cronograma_hitos_por_codigo", args_schema=ObraCodeArgs)
-def t_cronograma_hitos_por_codigo(obra_code: str):
-    """
-    Devuelve fechas clave de la obra (recepción, adjudicación, firma contrato, replanteo, fin contrato).
-    """
-    return {"query_key": "cronograma_hitos_por_codigo", "obra_code": obra_code.strip()}
-
-TOOLS = [t_contactos_obra_por_codigo, t_cronograma_hitos_por_codigo]
\ No newline at end of file
+# Las tools se generan a partir del REGISTRY: cada query con description se
+# expone al LLM con sus required_params como argumentos
+from typing import Any, Dict, List
+
+from pydantic import Field, create_model
+from langchain_core.tools import StructuredTool
+
+from database.sql.registry import REGISTRY, QuerySpec
+
+PARAM_DESCRIPTIONS = {
+    "obra_code": "Código de obra (OBRA_CODE)",
+}
+
+def _make_tool(name: str, spec: QuerySpec) -> StructuredTool:
+    fields = {
+        p: (str, Field(..., description=PARAM_DESCRIPTIONS.get(p, p))) for p in spec.required_params
+    }
+    args_schema = create_model(f"{name}_args", **fields)
+
+    def run(**kwargs: Any) -> Dict[str, Any]:
+        return {"query_key": name, **{k: str(v).strip() for k, v in kwargs.items()}}
+
+    return StructuredTool.from_function(
+        func=run, name=name, description=spec.description, args_schema=args_schema,
+    )
+
+def build_tools(registry: Dict[str, QuerySpec]) -> List[StructuredTool]:
+    """Una tool por query del registry que tenga description."""
+    return [_make_tool(name, spec) for name, spec in registry.items() if spec.description]
+
+TOOLS = build_tools(REGISTRY)
+TOOLS_BY_NAME = {t.name: t for t in TOOLS}
@@ -0,0 +1,33 @@
+# tools/routing.py
+# Sin dependencias (no importa langchain) para que el pre-router cargue al instante
+
+# Palabras clave (raíces, sin tildes) y peso para el pre-router determinista
+# (graph/chains/intent_router.py); las frases de varias palabras también valen
+ROUTING_KEYWORDS = {
+    "contactos_obra_por_codigo": {
+        "contacto": 2, "telefono": 2, "movil": 2, "cargo": 1, "nombre": 1,
+        "jefe de obra": 2, "encargado": 2, "responsable": 1, "quien": 1, "llamar": 1,
+    },
+    "cronograma_hitos_por_codigo": {
+        "fecha": 1, "hito": 2, "cronograma": 2, "recepcion": 2, "adjudica": 2,
+        "firm": 1, "replanteo": 2, "fin de contrato": 2, "fin contrato": 2, "cuando": 1,
+    },
+    "kpir_por_codigo": {
+        "kpir": 2, "pir": 2, "desviacion economica": 2, "desviacion": 1,
+    },
+    "precio_obra_por_codigo": {
+        "precio": 2, "presupuesto": 2, "iva": 1, "cuesta": 1,
+    },
+    "margen_obra_por_codigo": {
+        "margen": 2, "beneficio": 2, "rentabilidad": 2, "coste total": 1, "gana": 1,
+    },
+    "certificacion_obra_por_codigo": {
+        "certifica": 2, "facturado": 1,
+    },
+    "curva_s_por_codigo": {
+        "curva": 2, "evolucion": 2, "produccion": 1, "avance": 1,
+    },
+    "plazo_obra_por_codigo": {
+        "plazo": 2, "dura": 2, "dias": 1, "retraso": 1,
+    },
+}